@@ -28,6 +28,8 @@ from game import Configuration
 from util import nearestPoint
 from util import manhattanDistance
 import sys, util, types, time, random, layout, os
+import datasetWriter
+import sonar
 
 ########################################
 # Parameters for noisy sensor readings #
@@ -35,31 +37,71 @@ import sys, util, types, time, random, layout, os
 
 SONAR_NOISE_RANGE = 15 # Must be odd
 SONAR_MAX = (SONAR_NOISE_RANGE - 1)/2
-SONAR_NOISE_VALUES = [i - SONAR_MAX for i in range(SONAR_NOISE_RANGE)]
-SONAR_DENOMINATOR = 2 ** SONAR_MAX  + 2 ** (SONAR_MAX + 1) - 2.0
-SONAR_NOISE_PROBS = [2 ** (SONAR_MAX-abs(v)) / SONAR_DENOMINATOR  for v in SONAR_NOISE_VALUES]
+SONAR_NOISE_VALUES, SONAR_NOISE_PROBS = sonar.getGeometricNoise(SONAR_NOISE_RANGE)
+emissionModel = sonar.EmissionModel(SONAR_NOISE_VALUES, SONAR_NOISE_PROBS)
+SONAR_MODE = 'exact' # One of sonar.SONAR_MODES
+
+def setSonarNoise(noiseRange, noiseProbs=None):
+    """
+    Configures the sonar for this run: noiseRange errors centred on 0, with
+    the given probabilities or, by default, the geometric ones.
+    """
+    global SONAR_NOISE_RANGE, SONAR_MAX, SONAR_NOISE_VALUES, SONAR_NOISE_PROBS, emissionModel
+    values, probs = sonar.getGeometricNoise(noiseRange)
+    if noiseProbs != None:
+        if len(noiseProbs) != noiseRange:
+            raise Exception('Expected %d sonar noise probabilities, got %d' % (noiseRange, len(noiseProbs)))
+        total = float(sum(noiseProbs))
+        probs = [p / total for p in noiseProbs]
+    global readingSonar
+    SONAR_NOISE_RANGE, SONAR_MAX = noiseRange, (noiseRange - 1) / 2
+    SONAR_NOISE_VALUES, SONAR_NOISE_PROBS = values, probs
+    emissionModel = sonar.EmissionModel(values, probs)
+    readingSonar = None
+
+def setSonarMode(mode):
+    """
+    Makes the sonars of games started from now on exact, noisy or custom;
+    see sonar.SONAR_MODES.  Custom sonars draw their errors from the
+    probabilities given to setSonarNoise.
+    """
+    global SONAR_MODE, readingSonar
+    if mode not in sonar.SONAR_MODES:
+        raise Exception('Unknown sonar mode: ' + str(mode))
+    SONAR_MODE = mode
+    readingSonar = None
+
+def newSonar(seed=None):
+    """
+    Returns the sonar.Sonar of a new game, with the current sonar parameters.
+    Noisy sonars are seeded from the random module unless a seed is given.
+    """
+    return sonar.Sonar(SONAR_NOISE_VALUES, SONAR_NOISE_PROBS, SONAR_MODE, seed)
+
+def getEmissionModel():
+    "Returns the sonar.EmissionModel of the current sonar parameters."
+    return emissionModel
+
+readingSonar = None # The sonar of getNoisyDistance, made again when the parameters change
 
 def getNoisyDistance(pos1, pos2):
-    if pos2[1] == 1: return None
-    distance = util.manhattanDistance(pos1, pos2)
-    # return max(0, distance + util.sample(SONAR_NOISE_PROBS, SONAR_NOISE_VALUES))
-    return distance
+    """
+    Returns a single sonar reading from pos1 to a ghost at pos2.  Games read
+    all their ghosts at once through the sonar of their state instead.
+    """
+    global readingSonar
+    if readingSonar == None: readingSonar = newSonar()
+    return readingSonar.readDistances(pos1, [pos2])[0]
 
-observationDistributions = {}
 def getObservationDistribution(noisyDistance):
     """
     Returns the factor P( noisyDistance | TrueDistances ), the likelihood of the provided noisyDistance
     conditioned upon all the possible true distances that could have generated it.
+
+    The Counter is new on every call; inference code should read the
+    likelihood vectors of getEmissionModel() instead.
     """
-    global observationDistributions
-    if noisyDistance == None:
-        return util.Counter()
-    if noisyDistance not in observationDistributions:
-        distribution = util.Counter()
-        for error , prob in zip(SONAR_NOISE_VALUES, SONAR_NOISE_PROBS):
-            distribution[max(1, noisyDistance - error)] += prob
-        observationDistributions[noisyDistance] = distribution
-    return observationDistributions[noisyDistance]
+    return emissionModel.getDistribution(noisyDistance)
 
 ###################################################
 # YOUR INTERFACE TO THE PACMAN WORLD: A GameState #
@@ -117,7 +159,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( state.data.getAgentStateForUpdate( agentIndex ) )
 
         # Resolve multi-agent effects
         GhostRules.checkDeath( state, agentIndex )
@@ -128,14 +170,13 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        p = state.getPacmanPosition()
-        state.data.ghostDistances = [getNoisyDistance(p, state.getGhostPosition(i)) for i in range(1,state.getNumAgents())]
-        state.ghostPositions = self.ghostPositions = [self.getGhostPosition(i) for i in range(1, self.getNumAgents())]
-        a = 0
-        for i in range(1, self.getNumAgents()):
-            self.ghostDirections[a] = (state.data.agentStates[i].configuration.getDirection())
-            a += 1
-        if agentIndex == self.getNumAgents() - 1:
+        agentStates = state.data.agentStates
+        state.data.ghostDistances = state.sonar.readDistances(agentStates[0].getPosition(), [s.getPosition() for s in agentStates[1:]])
+        state.ghostPositions = self.ghostPositions = [s.getPosition() for s in self.data.agentStates[1:]]
+        ghostDirections = self.ghostDirections
+        for i in range(1, len(agentStates)):
+            ghostDirections[i - 1] = agentStates[i].configuration.direction
+        if agentIndex == len(agentStates) - 1:
             state.numMoves += 1
         return state
 
@@ -173,7 +214,7 @@ class GameState:
         return self.data.capsules
 
     def getNumFood( self ):
-        return self.data.food.count()
+        return self.data.numFood
 
     def getFood(self):
         """
@@ -217,24 +258,19 @@ class GameState:
         """
         return self.livingGhosts
 
-    def getDistanceNearestFood(self):
+    def getDistanceNearestFood(self, distancer=None):
         """
-        Returns the distance to the nearest food
+        Returns the distance to the nearest food, or None if there is none.
+        Distances are Manhattan distances, or maze distances if a Distancer is
+        given.
         """
-        if(self.getNumFood() > 0):
-            minDistance = 900000
-            pacmanPosition = self.getPacmanPosition()
-            for i in range(self.data.layout.width):
-                for j in range(self.data.layout.height):
-                    if self.hasFood(i, j):
-                        foodPosition = i, j
-                        distance = util.manhattanDistance(pacmanPosition, foodPosition)
-                        if distance < minDistance:
-                            minDistance = distance
-            return minDistance
-
-        else:
-            return None;
+        getDistance = None
+        if distancer != None:
+            getDistance = distancer.getDistance
+        nearest = self.data.getFoodIndex().getNearest(self.getPacmanPosition(), getDistance)
+        if nearest == None:
+            return None
+        return nearest[0]
 
     def getGhostPositions(self):
         return self.ghostPositions
@@ -272,10 +308,12 @@ class GameState:
             self.ghostPositions = prevState.ghostPositions[:]
             self.numMoves = prevState.numMoves;
             self.maxMoves = prevState.maxMoves;
+            self.sonar = prevState.sonar
         else: # Initial state
             self.data = GameStateData()
             self.numMoves = 0;
             self.maxMoves = -1;
+            self.sonar = None
             self.data.ghostDistances = []
 
     def deepCopy( self ):
@@ -284,6 +322,19 @@ class GameState:
         state.data.ghostDistances = self.data.ghostDistances
         return state
 
+    def makeObservation( self, agentIndex ):
+        """
+        Returns the state agentIndex observes: a copy like deepCopy's whose
+        food grid and agent states agents may change without touching this
+        state (see GameStateData.makeObservation).  Its sonar is a fork, so
+        the successors agents generate from it draw no noise from the game.
+        """
+        state = GameState( self )
+        state.data = self.data.makeObservation()
+        state.data.ghostDistances = self.data.ghostDistances[:]
+        state.sonar = self.sonar.fork()
+        return state
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -300,13 +351,19 @@ class GameState:
 
         return str(self.data)
 
-    def initialize( self, layout, numGhostAgents=1000 ):
+    def initialize( self, layout, numGhostAgents=1000, sonar=None ):
         """
         Creates an initial game state from a layout array (see layout.py).
+
+        The state and all its successors read the ghosts through sonar, a new
+        one (see newSonar) by default; the states agents observe read through
+        forks of it (see makeObservation).
         """
+        if sonar == None: sonar = newSonar()
+        self.sonar = sonar
         self.data.initialize(layout, numGhostAgents)
         self.livingGhosts = [False] + [True for i in range(numGhostAgents)]
-        self.data.ghostDistances = [getNoisyDistance(self.getPacmanPosition(), self.getGhostPosition(i)) for i in range(1, self.getNumAgents())]
+        self.data.ghostDistances = sonar.readDistances(self.getPacmanPosition(), [self.getGhostPosition(i) for i in range(1, self.getNumAgents())])
         self.ghostPositions = [self.getGhostPosition(i) for i in range(1, self.getNumAgents())]
 
     def getGhostPosition( self, agentIndex ):
@@ -369,7 +426,7 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        return state.data.layout.getLegalActions( state.data.agentStates[0].configuration )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action ):
@@ -380,7 +437,7 @@ class PacmanRules:
         if action not in legal:
             raise "Illegal action", action
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.getAgentStateForUpdate( 0 )
 
         # Update Configuration
         vector = Actions.directionToVector( action, 1)
@@ -394,7 +451,7 @@ class GhostRules:
     """
     def getLegalActions( state, ghostIndex ):
         conf = state.getGhostState( ghostIndex ).configuration
-        return Actions.getPossibleActions( conf, state.data.layout.walls )
+        return state.data.layout.getLegalActions( conf )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action, ghostIndex):
@@ -402,7 +459,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action: " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.getAgentStateForUpdate( ghostIndex )
         vector = Actions.directionToVector( action, 1 )
         ghostState.configuration = ghostState.configuration.generateSuccessor( vector )
     applyAction = staticmethod( applyAction )
@@ -410,7 +467,8 @@ class GhostRules:
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            conf = ghostState.configuration
+            ghostState.configuration = Configuration( nearestPoint( conf.pos ), conf.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
     decrementTimer = staticmethod( decrementTimer )
 
@@ -435,14 +493,17 @@ class GhostRules:
             if state.hasFood(pacmanPosition[0], pacmanPosition[1]):
                 state.data._foodEaten = pacmanPosition[0], pacmanPosition[1]
                 state.data.food[pacmanPosition[0]][pacmanPosition[1]] = False
+                state.data.numFood -= 1
                 state.data.scoreChange += 100
     checkFoodEaten = staticmethod( checkFoodEaten )
 
 
     def collide( state, ghostState, agentIndex):
         state.data.scoreChange += 200
+        ghostState = state.data.getAgentStateForUpdate( agentIndex )
         GhostRules.placeGhost(ghostState, agentIndex)
         # Added for first-person
+        state.data._eaten = state.data._eaten[:]
         state.data._eaten[agentIndex] = True
         state.setGhostNotLiving(agentIndex)
     collide = staticmethod( collide )
@@ -490,7 +551,9 @@ def parseAgentArgs(str):
 
 def readCommand( argv ):
     """
-    Processes the command used to run pacman from the command line.
+    Processes the command used to run pacman from the command line.  Returns
+    the keyword arguments of runGames, or of runBatch for headless batches
+    (--workers); only the latter hold numWorkers.
     """
     from optparse import OptionParser
     usageStr = """
@@ -514,7 +577,7 @@ def readCommand( argv ):
                       help=default('the ghost agent TYPE in the ghostAgents module to use'),
                       metavar = 'TYPE', default='StaticGhost')
     parser.add_option('-q', '--quietTextGraphics', action='store_true', dest='quietGraphics',
-                      help='Generate minimal output and no graphics', default=False)
+                      help='Generate minimal output and no graphics (never loads Tkinter)', default=False)
     parser.add_option('-k', '--numghosts', type='int', dest='numGhosts',
                       help=default('The maximum number of ghosts to use'), default=4)
     parser.add_option('-z', '--zoom', type='float', dest='zoom',
@@ -525,8 +588,35 @@ def readCommand( argv ):
                       help='Renders the ghosts in the display (cheating)', default=True)
     parser.add_option('-t', '--frameTime', dest='frameTime', type='float',
                       help=default('Time to delay between frames; <0 means keyboard'), default=0.1)
-
-    options, otherjunk = parser.parse_args()
+    parser.add_option('-m', '--maxMoves', dest='maxMoves', type='int',
+                      help=default('Maximum number of MOVES before Pacman loses; <0 means no limit'),
+                      metavar='MOVES', default=-1)
+    parser.add_option('-w', '--workers', dest='numWorkers', type='int',
+                      help=default('Plays the games headless across a pool of WORKERS processes; 0 means a normal run'),
+                      metavar='WORKERS', default=0)
+    parser.add_option('--seed', dest='seed',
+                      help='Base SEED from which every game of a headless batch is reseeded', metavar='SEED', default=None)
+    parser.add_option('--sonarMode', dest='sonarMode', type='choice', choices=sonar.SONAR_MODES,
+                      help=default('How the sonar reads ghost distances: ' + ' or '.join(sonar.SONAR_MODES)),
+                      metavar='MODE', default=SONAR_MODE)
+    parser.add_option('--sonarRange', dest='sonarRange', type='int',
+                      help=default('Number of distinct sonar errors, centred on 0; must be odd'), metavar='RANGE', default=SONAR_NOISE_RANGE)
+    parser.add_option('--sonarProbs', dest='sonarProbs',
+                      help='Comma-separated probabilities of the sonar errors of the custom mode, from the most negative up',
+                      metavar='PROBS', default=None)
+    parser.add_option('--profile', dest='profile',
+                      help='Profiles every phase of the games and writes the latencies to FILE (JSON for .json files, else Prometheus text); not for headless batches',
+                      metavar='FILE', default=None)
+    parser.add_option('-r', '--recordActions', action='store_true', dest='record',
+                      help='Writes game histories to a recording file (named by the time they were played)', default=False)
+    parser.add_option('--replay', dest='gameToReplay',
+                      help='A recording file to replay', default=None)
+    parser.add_option('--replayGame', dest='replayGame', type='int',
+                      help=default('The GAME of a recording file to replay, counting from 0'), metavar='GAME', default=0)
+    parser.add_option('--replayFrom', dest='replayFrom', type='int',
+                      help=default('The TICK to start replaying from'), metavar='TICK', default=0)
+
+    options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
         raise Exception('Command line input not understood: ' + otherjunk)
     args = dict()
@@ -534,6 +624,23 @@ def readCommand( argv ):
     # Fix the random seed
     if options.fixRandomSeed: random.seed('bustersPacman')
 
+    # Configure the sonar
+    sonarProbs = None
+    if (options.sonarMode == 'custom') != (options.sonarProbs != None):
+        raise Exception('--sonarProbs gives the noise of --sonarMode custom, and only of that mode')
+    if options.sonarProbs != None:
+        sonarProbs = [float(p) for p in options.sonarProbs.split(',')]
+    setSonarNoise(options.sonarRange, sonarProbs)
+    setSonarMode(options.sonarMode)
+
+    # Special case: recorded games carry their own layout and need no agents
+    if options.gameToReplay != None:
+        print 'Replaying recorded game %s.' % options.gameToReplay
+        import graphicsDisplay, recording
+        display = graphicsDisplay.FirstPersonPacmanGraphics(options.zoom, options.showGhosts, frameTime = options.frameTime)
+        recording.replayRecording(options.gameToReplay, display, options.replayGame, options.replayFrom)
+        sys.exit(0)
+
     # Choose a layout
     args['layout'] = layout.getLayout( options.layout )
     if args['layout'] == None: raise Exception("The layout " + options.layout + " cannot be found")
@@ -543,17 +650,32 @@ def readCommand( argv ):
     args['ghosts'] = [ghostType( i+1 ) for i in range( options.numGhosts )]
 
     # Choose a Pacman agent
-    noKeyboard = options.quietGraphics
+    noKeyboard = options.quietGraphics or options.numWorkers > 0
     pacmanType = loadAgent(options.pacman, noKeyboard)
     agentOpts = parseAgentArgs(options.agentArgs)
+
+    # Special case: batch runs build their own agents for every game, without graphics
+    if options.numWorkers > 0:
+        if options.seed == None: options.seed = random.randint(0, sys.maxint)
+        return dict(layout=args['layout'], pacmanType=pacmanType, agentOpts=agentOpts, ghostType=ghostType,
+                    numGhosts=options.numGhosts, numGames=options.numGames, numWorkers=options.numWorkers,
+                    seed=options.seed, maxMoves=options.maxMoves, record=options.record)
+
     agentOpts['ghostAgents'] = args['ghosts']
     pacman = pacmanType(**agentOpts) # Instantiate Pacman with agentArgs
     args['pacman'] = pacman
-    import graphicsDisplay
-    args['display'] = graphicsDisplay.FirstPersonPacmanGraphics(options.zoom, \
-                                                                  options.showGhosts, \
-                                                                  frameTime = options.frameTime)
+    if options.quietGraphics:
+        import textDisplay
+        args['display'] = textDisplay.NullGraphics()
+    else:
+        import graphicsDisplay
+        args['display'] = graphicsDisplay.FirstPersonPacmanGraphics(options.zoom, \
+                                                                      options.showGhosts, \
+                                                                      frameTime = options.frameTime)
     args['numGames'] = options.numGames
+    args['maxMoves'] = options.maxMoves
+    args['profile'] = options.profile
+    args['record'] = options.record
 
     return args
 
@@ -580,30 +702,120 @@ def loadAgent(pacman, nographics):
                 return getattr(module, pacman)
     raise Exception('The agent ' + pacman + ' is not specified in any *Agents.py.')
 
-def runGames( layout, pacman, ghosts, display, numGames, maxMoves=-1):
+def runGames( layout, pacman, ghosts, display, numGames, maxMoves=-1, profile=None, record=False):
     # Hack for agents writing to the display
     import __main__
     __main__.__dict__['_display'] = display
 
     rules = BustersGameRules()
     games = []
+    profiler = None
+    if profile != None:
+        import timing
+        profiler = timing.GameProfiler()
+    writer = None
+    if record:
+        import recording
+        writer = recording.RecordingWriter(recording.getRecordingName('recorded-games-'))
 
     for i in range( numGames ):
         game = rules.newGame( layout, pacman, ghosts, display, maxMoves )
+        game.profiler = profiler
+        if writer != None: game.recorder = recording.GameRecorder('busters', layout)
         game.run()
         games.append(game)
+        if profiler != None: profiler.export(profile)
+        if writer != None: writer.write(game.recorder.getRecord(game))
+    if writer != None: writer.close()
 
     if numGames > 1:
         scores = [game.state.getScore() for game in games]
         wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True)/ float(len(wins))
-        print 'Average Score:', sum(scores) / float(len(scores))
-        print 'Scores:       ', ', '.join([str(score) for score in scores])
-        print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
-        print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+        printSummary(scores, wins)
 
     return games
 
+def printSummary( scores, wins, moves=None ):
+    winRate = wins.count(True)/ float(len(wins))
+    print 'Average Score:', sum(scores) / float(len(scores))
+    print 'Scores:       ', ', '.join([str(score) for score in scores])
+    print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
+    print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+    if moves != None:
+        print 'Average Moves:', sum(moves) / float(len(moves))
+
+def runSeededGame( job ):
+    """
+    Plays a single headless game of a batch and returns its (score, win,
+    moves, payload), where payload is the encoded recording of the game (see
+    recording.GameRecord.encodePayload) if the job asks for one, else None.
+
+    Fresh agents are built for every game and the random module is reseeded
+    from the job's seed, so a game gives the same result whichever worker
+    process plays it.  The training data the agents log goes to a dataset
+    shard named after the seed.
+    """
+    layout, pacmanType, agentOpts, ghostType, numGhosts, maxMoves, seed, record = job
+    random.seed(seed)
+    datasetWriter.setShard(seed)
+
+    import __main__, textDisplay
+    display = textDisplay.NullGraphics()
+    __main__.__dict__['_display'] = display
+
+    ghosts = [ghostType( i+1 ) for i in range( numGhosts )]
+    agentOpts = dict(agentOpts)
+    agentOpts['ghostAgents'] = ghosts
+    pacman = pacmanType(**agentOpts)
+
+    game = BustersGameRules().newGame( layout, pacman, ghosts, display, maxMoves )
+    if record:
+        import recording
+        game.recorder = recording.GameRecorder('busters', layout)
+    try:
+        game.run()
+    finally:
+        datasetWriter.flushAll()
+        datasetWriter.setShard(None)
+    payload = None
+    if record: payload = game.recorder.getRecord(game).encodePayload()
+    return game.state.getScore(), game.state.isWin(), game.state.numMoves, payload
+
+def runBatch( layout, pacmanType, agentOpts, ghostType, numGhosts, numGames, numWorkers=1, seed=0, maxMoves=-1, record=False ):
+    """
+    Plays numGames headless games spread over a pool of numWorkers processes.
+
+    Game i is seeded with '<seed>-<i>', so the merged results match a serial
+    run (numWorkers=1) with the same seed game for game.  The dataset shards
+    the games write are merged in game order as well, and so are their
+    recordings if record is set.  Returns the list of (score, win, moves)
+    tuples in game order.
+    """
+    seeds = ['%s-%d' % (seed, i) for i in range( numGames )]
+    jobs = [(layout, pacmanType, agentOpts, ghostType, numGhosts, maxMoves, s, record) for s in seeds]
+    if numWorkers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(numWorkers)
+        try:
+            results = pool.map(runSeededGame, jobs, max(1, numGames / (4 * numWorkers)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(runSeededGame, jobs)
+    datasetWriter.mergeAllShards(seeds)
+    if record:
+        import recording
+        writer = recording.RecordingWriter(recording.getRecordingName('recorded-games-'))
+        fingerprint = recording.getLayoutFingerprint(layout)
+        for r in results: writer.writeEncoded(fingerprint, layout, r[3])
+        writer.close()
+    results = [r[:3] for r in results]
+
+    print 'Seed:         ', seed
+    printSummary([r[0] for r in results], [r[1] for r in results], [r[2] for r in results])
+    return results
+
 if __name__ == '__main__':
     """
     The main function called when pacman.py is run
@@ -616,4 +828,7 @@ if __name__ == '__main__':
     > python pacman.py --help
     """
     args = readCommand( sys.argv[1:] ) # Get game components based on input
-    runGames( **args )
+    if 'numWorkers' in args:
+        runBatch( **args )
+    else:
+        runGames( **args )
@@ -26,6 +26,8 @@ class NullGraphics:
         pass
     def update(self, state):
         pass
+    def checkNullDisplay(self):
+        return True
     def pause(self):
         pass
     def draw(self, state):
@@ -46,16 +48,14 @@ class KeyboardInference(inference.InferenceModule):
         self.beliefs.normalize()
 
     def observe(self, observation, gameState):
+        "Spreads the beliefs evenly over the positions that could explain the reading."
         noisyDistance = observation
-        emissionModel = busters.getObservationDistribution(noisyDistance)
-        pacmanPosition = gameState.getPacmanPosition()
-        allPossible = util.Counter()
-        for p in self.legalPositions:
-            trueDistance = util.manhattanDistance(p, pacmanPosition)
-            if emissionModel[trueDistance] > 0:
-                allPossible[p] = 1.0
-        allPossible.normalize()
-        self.beliefs = allPossible
+        if noisyDistance == None:
+            self.beliefs = util.Counter()
+            return
+        distances = self.positionIndex.getDistancesToPacman(gameState.getPacmanPosition())
+        possible = inference.getEmissionVector(noisyDistance, distances) > 0
+        self.beliefs = self.positionIndex.asCounter(possible / float(max(possible.sum(), 1)))
 
     def elapseTime(self, gameState):
         pass
@@ -125,10 +125,23 @@ class BustersKeyboardAgent(BustersAgent, KeyboardAgent):
         return KeyboardAgent.getAction(self, gameState)
 
 from distanceCalculator import Distancer
+from datasetWriter import Dataset, NUMERIC
 from game import Actions
 from game import Directions
 import random, sys
 
+DIRECTIONS = [Directions.STOP, Directions.EAST, Directions.WEST, Directions.NORTH, Directions.SOUTH]
+
+# Una fila por tick de BasicAgentAA, en CSV sin cabecera
+GAME_DATA = Dataset("gameData.txt",
+    [('pacmanX', NUMERIC), ('pacmanY', NUMERIC), ('pacmanOR', DIRECTIONS)] +
+    [('legalMove%d' % i, DIRECTIONS) for i in range(1, 6)] +
+    [('ghost%dalive' % i, [True, False]) for i in range(1, 5)] +
+    [('ghost%d%s' % (i, axis), NUMERIC) for i in range(1, 5) for axis in 'XY'] +
+    [('ghost%ddistance' % i, NUMERIC) for i in range(1, 5)] +
+    [('nearestPacdot', NUMERIC), ('score', NUMERIC)],
+    header=False, missing='None')
+
 '''Random PacMan Agent'''
 class RandomPAgent(BustersAgent):
 
@@ -216,6 +229,7 @@ class BasicAgentAA(BustersAgent):
         BustersAgent.registerInitialState(self, gameState)
         self.distancer = Distancer(gameState.data.layout, False)
         self.countActions = 0
+        self.dataWriter = GAME_DATA.openWriter()
         
     ''' Example of counting something'''
     def countFood(self, gameState):
@@ -323,20 +337,16 @@ class BasicAgentAA(BustersAgent):
         # Asegurar que legalMoves tenga siempre 5 elementos, rellenando con None si es necesario
         legalMovesPadded = legalmoves + [None] * (5 - len(legalmoves))
 
-        # Preparar la cadena de datos incluyendo los estados de los fantasmas vivos
-        dataLine = "{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{}".format(
-            pacmanPosition[0], pacmanPosition[1], pacmanDirection, legalMovesPadded[0], legalMovesPadded[1], legalMovesPadded[2], legalMovesPadded[3], legalMovesPadded[4],
-            livingGhostsFiltered[0], livingGhostsFiltered[1], livingGhostsFiltered[2], livingGhostsFiltered[3],
-            ghostPositionsPadded[0][0], ghostPositionsPadded[0][1],
-            ghostPositionsPadded[1][0], ghostPositionsPadded[1][1],
-            ghostPositionsPadded[2][0], ghostPositionsPadded[2][1],
-            ghostPositionsPadded[3][0], ghostPositionsPadded[3][1],
-            ghostDistancesPadded[0], ghostDistancesPadded[1], ghostDistancesPadded[2], ghostDistancesPadded[3],
-            nearestFoodDistance, score
-        )
-
-        # Escribir en un archivo (anhadiendo en cada llamada)
-        with open("gameData.txt", "a") as file:
-            file.write(dataLine + "\n")
-
-        return dataLine
\ No newline at end of file
+        # Fila en el orden de las columnas de GAME_DATA, incluyendo los estados de los fantasmas vivos
+        row = (pacmanPosition[0], pacmanPosition[1], pacmanDirection) + tuple(legalMovesPadded[:5]) + \
+              tuple(livingGhostsFiltered[:4]) + \
+              ghostPositionsPadded[0] + ghostPositionsPadded[1] + ghostPositionsPadded[2] + ghostPositionsPadded[3] + \
+              tuple(ghostDistancesPadded[:4]) + (nearestFoodDistance, score)
+
+        # Anhadir la fila al buffer; se escribe en gameData.txt por lotes
+        self.dataWriter.write(row)
+        return row
+
+    def final(self, gameState):
+        "Writes out the rows still buffered at the end of the game."
+        self.dataWriter.close()
@@ -0,0 +1,308 @@
+# bustersBatch.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Many busters games on one layout, stepped in lockstep with NumPy.
+
+A BustersBatch holds numGames games as arrays instead of GameStates: the
+cell of every agent, a food mask, the living ghosts, the scores and the move
+counts.  The agents take turns as in a Game, Pacman first, and step applies
+one move of the agent whose turn it is to every game at once, with the rules
+of busters.py: movement, captures, food, the time penalty and the loss at
+maxMoves.
+
+  batch = BustersBatch(layout.getLayout('smallHunt'), 1000, maxMoves=100)
+  readings = batch.reset()
+  while not batch.dones.all():
+      readings, rewards, dones, info = batch.step(batch.getRandomActions())
+
+Actions are indices into ACTIONS, and readings the sonar distances from
+Pacman to every ghost, -1 for captured ones.  Games that are over ignore
+their actions until they are reset.
+
+Run this module to compare a batch with games played by BustersGameRules,
+or to time it:
+
+  > python bustersBatch.py --check 100 -l smallHunt
+  > python bustersBatch.py --benchmark 200 -n 10000
+"""
+
+import random
+import numpy
+import busters, layout
+from game import Directions, Actions, Configuration
+
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+STOP = ACTIONS.index(Directions.STOP)
+NO_READING = -1 # Sonar reading of a captured ghost
+
+class BustersBatch:
+    """
+    numGames busters games on layout, with the first numGhosts ghosts of the
+    layout (all of them by default).  Cells are numbered like the bits of a
+    Grid: (x, y) is cell x * height + y.
+
+    The sonar reads in sonarMode (busters.SONAR_MODE by default) with the
+    noise of busters.py; noisy readings come from a NumPy stream seeded
+    with seed.
+    """
+
+    def __init__(self, layout, numGames, numGhosts=None, maxMoves=-1, sonarMode=None, seed=None):
+        self.layout = layout
+        self.numGames = numGames
+        self.maxMoves = maxMoves
+        self.height = layout.height
+        numCells = layout.width * layout.height
+
+        # The cells of the agents at the start, as GameStateData.initialize picks them
+        if numGhosts == None: numGhosts = layout.getNumGhosts()
+        self.startCells = []
+        ghosts = 0
+        for isPacman, (x, y) in layout.agentPositions:
+            if not isPacman:
+                if ghosts == numGhosts: continue
+                ghosts += 1
+            self.startCells.append(x * self.height + y)
+        self.numAgents = len(self.startCells)
+        self.jailCells = numpy.array([(2 * i - 1) * self.height + 1 for i in range(1, self.numAgents)], dtype=int)
+        if len(self.jailCells) > 0 and self.jailCells.max() >= numCells:
+            raise Exception('The layout is too narrow to jail %d ghosts' % (self.numAgents - 1))
+
+        # The legal actions of every cell and the cell each one leads to
+        self.legal = numpy.zeros((numCells, len(ACTIONS)), dtype=bool)
+        self.moves = numpy.tile(numpy.arange(numCells)[:, None], (1, len(ACTIONS)))
+        for x in range(layout.width):
+            for y in range(layout.height):
+                try:
+                    legal = Actions.getPossibleActions(Configuration((x, y), Directions.STOP), layout.walls)
+                except IndexError:
+                    continue # No agent can stand on the border
+                for action in legal:
+                    dx, dy = Actions.directionToVector(action)
+                    self.legal[x * self.height + y, ACTIONS.index(action)] = True
+                    self.moves[x * self.height + y, ACTIONS.index(action)] = (x + dx) * self.height + y + dy
+        self.startFood = numpy.array([layout.food[c / self.height][c % self.height] for c in range(numCells)], dtype=bool)
+
+        if sonarMode == None: sonarMode = busters.SONAR_MODE
+        self.sonarMode = sonarMode
+        self.noiseValues = numpy.array(busters.SONAR_NOISE_VALUES, dtype=int)
+        cdf = numpy.cumsum(busters.SONAR_NOISE_PROBS, dtype=float)
+        self.noiseCdf = cdf / cdf[-1]
+        self.rng = numpy.random.RandomState(seed)
+        self.games = numpy.arange(numGames)
+        self.reset()
+
+    def reset(self, games=None):
+        """
+        Restarts the games whose indices are given, all of them by default, and
+        returns the readings of every game.  Only Pacman's turn lets a subset
+        of the games restart.
+        """
+        if games is None:
+            games = self.games
+            self.agentIndex = 0
+            self.positions = numpy.empty((self.numGames, self.numAgents), dtype=int)
+            self.food = numpy.empty((self.numGames, len(self.startFood)), dtype=bool)
+            self.living = numpy.empty((self.numGames, self.numAgents), dtype=bool)
+            self.scores = numpy.zeros(self.numGames, dtype=int)
+            self.numFood = numpy.zeros(self.numGames, dtype=int)
+            self.numMoves = numpy.zeros(self.numGames, dtype=int)
+            self.dones = numpy.zeros(self.numGames, dtype=bool)
+            self.wins = numpy.zeros(self.numGames, dtype=bool)
+        elif self.agentIndex != 0:
+            raise Exception('Games can only restart on the turn of Pacman')
+        self.positions[games] = self.startCells
+        self.food[games] = self.startFood
+        self.living[games] = True
+        self.living[games, 0] = False # Like GameState.livingGhosts
+        self.scores[games] = 0
+        self.numFood[games] = self.startFood.sum()
+        self.numMoves[games] = 0
+        self.dones[games] = False
+        self.wins[games] = False
+        return self.getReadings()
+
+    def getLegalActionMask(self):
+        "Returns a (numGames, len(ACTIONS)) mask of the legal actions of the agent to move."
+        return self.legal[self.positions[:, self.agentIndex]]
+
+    def getRandomActions(self):
+        "Returns an action for every game, drawn uniformly from the legal ones of the agent to move."
+        mask = self.getLegalActionMask()
+        counts = mask.sum(1)
+        choices = (self.rng.random_sample(self.numGames) * counts).astype(int)
+        return (mask.cumsum(1) > choices[:, None]).argmax(1)
+
+    def getReadings(self):
+        "Returns the (numGames, ghosts) sonar readings of the ghosts, NO_READING for captured ones."
+        pacman = self.positions[:, :1]
+        ghosts = self.positions[:, 1:]
+        distances = abs(ghosts / self.height - pacman / self.height) + abs(ghosts % self.height - pacman % self.height)
+        if self.sonarMode != 'exact':
+            indices = numpy.searchsorted(self.noiseCdf, self.rng.random_sample(distances.shape), side='right')
+            distances = numpy.maximum(0, distances + self.noiseValues[numpy.minimum(indices, len(self.noiseCdf) - 1)])
+        distances[ghosts % self.height == 1] = NO_READING # Jailed
+        return distances
+
+    def step(self, actions):
+        """
+        Moves the agent whose turn it is in every game with actions, an index
+        into ACTIONS per game, and returns (readings, rewards, dones, info):
+        the readings after the move, the score change of every game, which
+        games are over and a dictionary holding the agentIndex that moved.
+        """
+        actions = numpy.asarray(actions, dtype=int)
+        agentIndex = self.agentIndex
+        active = ~self.dones
+        cells = self.positions[:, agentIndex]
+        illegal = active & ~self.legal[cells, actions]
+        if illegal.any():
+            raise Exception('Illegal action for agent %d in games %s' % (agentIndex, self.games[illegal].tolist()))
+        cells = numpy.where(active, self.moves[cells, actions], cells)
+        self.positions[:, agentIndex] = cells
+        rewards = numpy.zeros(self.numGames, dtype=int)
+
+        if agentIndex == 0:
+            rewards -= busters.TIME_PENALTY * active
+            # Pacman captures every ghost on his cell
+            captures = (self.positions[:, 1:] == cells[:, None]) & active[:, None]
+            if captures.any():
+                rewards += 200 * captures.sum(1)
+                self.living[:, 1:] &= ~captures
+                self.positions[:, 1:] = numpy.where(captures, self.jailCells, self.positions[:, 1:])
+            eaten = active & self.food[self.games, cells]
+            if eaten.any():
+                self.food[self.games[eaten], cells[eaten]] = False
+                self.numFood -= eaten
+                rewards += 100 * eaten
+        else:
+            captures = active & (cells == self.positions[:, 0])
+            if captures.any():
+                rewards += 200 * captures
+                self.living[captures, agentIndex] = False
+                self.positions[captures, agentIndex] = self.jailCells[agentIndex - 1]
+            if agentIndex == self.numAgents - 1:
+                self.numMoves += active
+
+        self.scores += rewards
+        wins = ~self.living.any(1)
+        over = wins
+        if self.maxMoves > 0: over = over | (self.numMoves >= self.maxMoves)
+        self.wins |= active & wins
+        self.dones |= active & over
+        self.agentIndex = (agentIndex + 1) % self.numAgents
+        return self.getReadings(), rewards, self.dones.copy(), {'agentIndex': agentIndex}
+
+    def getPositions(self, game):
+        "Returns the (x, y) position of every agent of a game."
+        return [(c / self.height, c % self.height) for c in self.positions[game].tolist()]
+
+class MoveCollector:
+    "A Game recorder (see Game.recorder) that keeps every action and the state it led to."
+
+    def __init__(self):
+        self.moves = []
+
+    def addMove(self, agentIndex, action, state):
+        self.moves.append((action, state))
+
+def checkParity(layout, numGames, maxMoves=100, seed=0):
+    """
+    Plays numGames games of random agents with BustersGameRules, replays
+    their moves in a BustersBatch, and returns the number of moves after
+    which a batch game differs from the GameState.
+    """
+    import textDisplay
+    histories = []
+    for i in range(numGames):
+        random.seed('%s-%d' % (seed, i))
+        # RandomGhost draws from the legal actions of its index, Pacman's for 0
+        agents = [busters.RandomGhost(0)] + [busters.RandomGhost(j + 1) for j in range(layout.getNumGhosts())]
+        game = busters.BustersGameRules().newGame(layout, agents[0], agents[1:], textDisplay.NullGraphics(), maxMoves)
+        game.recorder = MoveCollector()
+        game.run()
+        histories.append(game.recorder.moves)
+
+    batch = BustersBatch(layout, numGames, maxMoves=maxMoves, sonarMode='exact')
+    mismatches = 0
+    for t in range(max([len(moves) for moves in histories])):
+        actions = [STOP] * numGames
+        for i, moves in enumerate(histories):
+            if t < len(moves): actions[i] = ACTIONS.index(moves[t][0])
+        readings, rewards, dones, info = batch.step(actions)
+        for i, moves in enumerate(histories):
+            if t >= len(moves): continue
+            state = moves[t][1]
+            if (batch.getPositions(i) != [s.getPosition() for s in state.data.agentStates]
+                or batch.living[i].tolist() != state.getLivingGhosts()
+                or batch.scores[i] != state.getScore() or batch.numFood[i] != state.getNumFood()
+                or batch.numMoves[i] != state.numMoves
+                or [None if r == NO_READING else r for r in readings[i].tolist()] != state.getNoisyGhostDistances()
+                or dones[i] != (t == len(moves) - 1) or batch.wins[i] != state.isWin()):
+                mismatches += 1
+    return mismatches, sum([len(moves) for moves in histories])
+
+def benchmark(layout, numGames, numSteps, maxMoves=-1):
+    """
+    Returns the agent moves per second of a batch of numGames games playing
+    random actions, restarting the games as they end.
+    """
+    import timing
+    batch = BustersBatch(layout, numGames, maxMoves=maxMoves, sonarMode='exact', seed=0)
+    start = timing.perfCounter()
+    for t in range(numSteps):
+        if batch.agentIndex == 0 and batch.dones.any():
+            batch.reset(batch.dones.nonzero()[0])
+        batch.step(batch.getRandomActions())
+    return numGames * numSteps / (timing.perfCounter() - start)
+
+if __name__ == '__main__':
+    """
+    The main function called when bustersBatch.py is run
+    from the command line:
+
+    > python bustersBatch.py --check 100
+
+    See the usage string for more details.
+    """
+    from optparse import OptionParser
+    parser = OptionParser("""
+    USAGE:      python bustersBatch.py <options>
+    EXAMPLES:   (1) python bustersBatch.py --check 100 -l smallHunt
+                    - compares 100 batched games with games of busters.py
+                (2) python bustersBatch.py --benchmark 200 -n 10000
+                    - times 200 moves of 10000 games at once
+    """)
+    parser.add_option('-l', '--layout', dest='layout', help='the LAYOUT_FILE of the games (default: smallHunt)',
+                      metavar='LAYOUT_FILE', default='smallHunt')
+    parser.add_option('-n', '--numGames', dest='numGames', type='int',
+                      help='the number of GAMES of a benchmark (default: 10000)', metavar='GAMES', default=10000)
+    parser.add_option('-m', '--maxMoves', dest='maxMoves', type='int',
+                      help='Maximum number of MOVES before Pacman loses (default: 100)', metavar='MOVES', default=100)
+    parser.add_option('--check', dest='check', type='int',
+                      help='Compares GAMES games with busters.py', metavar='GAMES', default=0)
+    parser.add_option('--benchmark', dest='benchmark', type='int',
+                      help='Times STEPS moves of the games', metavar='STEPS', default=0)
+    parser.add_option('--seed', dest='seed', help='SEED of the games checked (default: 0)', metavar='SEED', default='0')
+    options, otherjunk = parser.parse_args()
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    theLayout = layout.getLayout(options.layout)
+    if theLayout == None: raise Exception("The layout " + options.layout + " cannot be found")
+    if options.check > 0:
+        mismatches, numMoves = checkParity(theLayout, options.check, options.maxMoves, options.seed)
+        print 'Parity:        %d mismatches in %d moves of %d games' % (mismatches, numMoves, options.check)
+    if options.benchmark > 0:
+        rate = benchmark(theLayout, options.numGames, options.benchmark, options.maxMoves)
+        print 'Speed:         %.0f agent moves per second' % rate
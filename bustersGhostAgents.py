@@ -24,6 +24,9 @@ class StationaryGhost( ghostAgents.GhostAgent ):
         dist[Directions.STOP] = 1.0
         return dist
 
+    def getTransitionKey( self, state ):
+        return ()
+
 class DispersingGhost( ghostAgents.GhostAgent ):
     "Chooses an action that distances the ghost from the other ghosts with probability spreadProb."
     def __init__( self, index, spreadProb=0.5):
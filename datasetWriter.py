@@ -0,0 +1,234 @@
+# datasetWriter.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Buffered writers for the training data that agents log on every tick.
+
+A Dataset fixes the file, the format and the schema once:
+
+  GAME_DATA = Dataset('gameData.txt', [('Score', NUMERIC), ('Move', ['North', 'South'])])
+
+and its writers collect rows in memory and append them to the file in
+batches, so logging a tick is a list append:
+
+  writer = GAME_DATA.openWriter()
+  writer.write((10, 'North'))
+  writer.close()
+
+Columns are NUMERIC or nominal, given as the list of their values; None is a
+missing value in either.  Files are written as CSV, ARFF or a binary columnar
+format that readColumns reads back.
+
+When several games run at once (see runBatch in busters.py), each calls
+setShard first so that its writers append to a shard file of their own, and
+mergeAllShards appends the shards to the datasets in order at the end.
+"""
+
+import os, sys, struct, array, json, shutil, atexit
+
+NUMERIC = 'NUMERIC'
+FORMATS = ['csv', 'arff', 'columnar']
+BUFFER_SIZE = 1000 # Rows kept in memory before a writer appends them to its file
+
+COLUMNAR_MAGIC = 'PACCOL1\n'
+COLUMNAR_LENGTH = struct.Struct('<I')
+
+datasets = []    # Every Dataset defined, for mergeAllShards
+openWriters = [] # Writers with rows that may not be flushed yet
+shard = None     # Shard that new writers append to, if any
+
+class Dataset:
+    """
+    A data file with a fixed schema.
+
+    columns is a list of (name, type) pairs, where type is NUMERIC or the list
+    of values of a nominal column.  format is one of FORMATS.  For CSV files,
+    header says whether the column names head the file and missing is written
+    for None; ARFF and columnar files always describe their columns.
+    """
+
+    def __init__(self, path, columns, format='csv', header=True, missing='', relation=None):
+        if format not in FORMATS:
+            raise Exception('Unknown dataset format: ' + str(format))
+        self.path = path
+        self.columns = list(columns)
+        self.format = format
+        self.header = header
+        self.missing = missing
+        self.relation = relation or os.path.splitext(os.path.basename(path))[0]
+        datasets.append(self)
+
+    def openWriter(self, bufferSize=BUFFER_SIZE):
+        "Returns a writer appending to this dataset, or to its current shard."
+        return DatasetWriter(self, self.getShardPath(shard), bufferSize)
+
+    def getShardPath(self, shard):
+        if shard == None: return self.path
+        return '%s.shard-%s' % (self.path, shard)
+
+    def encodeHeader(self):
+        "Returns what the format writes at the start of a file."
+        if self.format == 'csv':
+            if not self.header: return ''
+            return ','.join([name for name, type in self.columns]) + '\n'
+        if self.format == 'arff':
+            lines = ['@RELATION %s' % self.relation, '']
+            for name, type in self.columns:
+                if type == NUMERIC:
+                    lines.append('@ATTRIBUTE %s NUMERIC' % name)
+                else:
+                    lines.append('@ATTRIBUTE %s {%s}' % (name, ','.join([str(v) for v in type])))
+            return '\n'.join(lines + ['', '@DATA', ''])
+        schema = json.dumps(self.columns)
+        return COLUMNAR_MAGIC + COLUMNAR_LENGTH.pack(len(schema)) + schema
+
+    def encodeRows(self, rows):
+        "Returns rows, a list of tuples in column order, as they appear in the file."
+        if self.format == 'columnar':
+            return encodeBlock(self.columns, rows)
+        if self.format == 'csv':
+            missing = self.missing
+        else:
+            missing = '?'
+        lines = [','.join([missing if v == None else str(v) for v in row]) for row in rows]
+        return '\n'.join(lines) + '\n'
+
+    def mergeShards(self, shards):
+        """
+        Appends the listed shards that exist to the dataset, in order, and
+        deletes them.
+        """
+        header = self.encodeHeader()
+        for s in shards:
+            shardPath = self.getShardPath(s)
+            if not os.path.exists(shardPath): continue
+            source = open(shardPath, 'rb')
+            try:
+                if source.read(len(header)) != header:
+                    raise Exception('Shard %s does not match the schema of %s' % (shardPath, self.path))
+                target = openForAppend(self.path, header)
+                try: shutil.copyfileobj(source, target)
+                finally: target.close()
+            finally:
+                source.close()
+            os.remove(shardPath)
+
+class DatasetWriter:
+    "Collects rows for a Dataset and appends them to path bufferSize at a time."
+
+    def __init__(self, dataset, path, bufferSize=BUFFER_SIZE):
+        self.dataset = dataset
+        self.path = path
+        self.bufferSize = bufferSize
+        self.rows = []
+        openWriters.append(self)
+
+    def write(self, row):
+        "Adds a tuple of values in column order."
+        self.rows.append(row)
+        if len(self.rows) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        if len(self.rows) == 0: return
+        f = openForAppend(self.path, self.dataset.encodeHeader())
+        try: f.write(self.dataset.encodeRows(self.rows))
+        finally: f.close()
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self in openWriters:
+            openWriters.remove(self)
+
+def openForAppend(path, header):
+    "Opens path for appending, writing the header first if the file is new or empty."
+    isNew = not os.path.exists(path) or os.path.getsize(path) == 0
+    f = open(path, 'ab')
+    if isNew: f.write(header)
+    return f
+
+def encodeBlock(columns, rows):
+    """
+    Encodes rows as a block of the columnar format: the row count, then each
+    column in turn, little-endian.  NUMERIC columns are doubles with NaN for
+    None; nominal columns are the signed byte index of the value, -1 for None.
+    """
+    parts = [COLUMNAR_LENGTH.pack(len(rows))]
+    for i, (name, type) in enumerate(columns):
+        values = [row[i] for row in rows]
+        if type == NUMERIC:
+            column = array.array('d', [float('nan') if v == None else v for v in values])
+        else:
+            codes = dict([(v, code) for code, v in enumerate(type)])
+            column = array.array('b', [-1 if v == None else codes[v] for v in values])
+        if sys.byteorder != 'little': column.byteswap()
+        parts.append(column.tostring())
+    return ''.join(parts)
+
+def readColumns(path):
+    """
+    Reads a columnar dataset file back.  Returns its list of (name, type)
+    columns and a dictionary from column name to the list of its values.
+    """
+    f = open(path, 'rb')
+    try: data = f.read()
+    finally: f.close()
+    if not data.startswith(COLUMNAR_MAGIC):
+        raise Exception('Not a columnar dataset: ' + path)
+    offset = len(COLUMNAR_MAGIC)
+    length, = COLUMNAR_LENGTH.unpack_from(data, offset)
+    offset += COLUMNAR_LENGTH.size
+    columns = []
+    for name, type in json.loads(data[offset:offset + length]):
+        if type == NUMERIC: type = NUMERIC
+        else: type = [str(v) if isinstance(v, unicode) else v for v in type]
+        columns.append((str(name), type))
+    offset += length
+
+    values = dict([(name, []) for name, type in columns])
+    while offset < len(data):
+        numRows, = COLUMNAR_LENGTH.unpack_from(data, offset)
+        offset += COLUMNAR_LENGTH.size
+        for name, type in columns:
+            if type == NUMERIC:
+                column = array.array('d')
+            else:
+                column = array.array('b')
+            size = column.itemsize * numRows
+            column.fromstring(data[offset:offset + size])
+            if sys.byteorder != 'little': column.byteswap()
+            offset += size
+            if type == NUMERIC:
+                values[name].extend([None if v != v else v for v in column])
+            else:
+                values[name].extend([None if code < 0 else type[code] for code in column])
+    return columns, values
+
+def setShard(newShard):
+    "Makes writers opened from now on append to the given shard (None for the datasets themselves)."
+    global shard
+    shard = newShard
+
+def mergeAllShards(shards):
+    "Merges the listed shards of every dataset; see Dataset.mergeShards."
+    for dataset in datasets:
+        dataset.mergeShards(shards)
+
+def flushAll():
+    "Flushes every writer still open, so that no rows are lost when the program exits."
+    for writer in openWriters[:]:
+        writer.flush()
+
+atexit.register(flushAll)
@@ -30,7 +30,8 @@ shouldn't need to modify the Distancer code in order to use its
 distances.
 """
 
-import threading, sys, time, random
+import threading, sys, time, random, os, mmap, struct, tempfile
+from array import array
 
 class Distancer:
   def __init__(self, layout, background=True, default=10000):
@@ -75,11 +76,10 @@ class Distancer:
     return bestDistance
 
   def getDistanceOnGrid(self, pos1, pos2):
-    key = (pos1, pos2)
-    if key in self._distances:
-      return self._distances[key]
-    else:
-      raise Exception("Positions not in grid: " + str(key))
+    try:
+      return self._distances.getDistance(pos1, pos2)
+    except KeyError:
+      raise Exception("Positions not in grid: " + str((pos1, pos2)))
 
   def isReadyForMazeDistance(self):
     return self._distances != None
@@ -131,7 +131,10 @@ class DistanceCalculator(threading.Thread):
       if distanceThread != None: raise Exception('Multiple distance threads')
       distanceThread = self
 
-      distances = computeDistances(self.layout)
+      distances = loadDistances(self.layout.walls)
+      if distances == None:
+        distances = computeDistances(self.layout)
+        saveDistances(self.layout.walls, distances)
       print >>sys.stdout, '[Distancer]: Switching to maze distances'
 
       distanceMap[self.layout.walls] = distances
@@ -142,46 +145,179 @@ class DistanceCalculator(threading.Thread):
     distanceMapSemaphore.release()
     self.distancer._distances = distances
 
+UNREACHABLE = 0xFFFF # Stored for pairs of cells with no path between them
+
+class DistanceMatrix:
+  """
+  All-pairs maze distances for the open cells of a layout.
+
+  Cells are numbered in walls.asList(False) order; self.index maps a position
+  to its cell id and the distance from cell i to cell j is entry
+  i * numCells + j of the flat unsigned short array self.distances.  Positions
+  with no path between them are reported as sys.maxint.
+
+  Lookups by (pos1, pos2) key are supported as well, like the dictionary this
+  replaces.
+  """
+  def __init__(self, cells, distances):
+    self.cells = cells
+    self.index = dict([(cell, i) for i, cell in enumerate(cells)])
+    self.numCells = len(cells)
+    self.distances = distances
+
+  def getDistance(self, pos1, pos2):
+    "Raises a KeyError if either position is not an open cell."
+    distance = self.distances[self.index[pos1] * self.numCells + self.index[pos2]]
+    if distance == UNREACHABLE: return sys.maxint
+    return distance
+
+  def __contains__(self, key):
+    pos1, pos2 = key
+    return pos1 in self.index and pos2 in self.index
+
+  def __getitem__(self, key):
+    return self.getDistance(*key)
+
+  def __len__(self):
+    return self.numCells * self.numCells
+
 def computeDistances(layout):
-    distances = {}
-    allNodes = layout.walls.asList(False)
-    for source in allNodes:
-        dist = {}
-        closed = {}
-        for node in allNodes:
-            dist[node] = sys.maxint
-        import util
-        queue = util.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
-                continue
-            closed[node] = True
-            nodeDist = dist[node]
-            adjacent = []
-            x, y = node
-            if not layout.isWall((x,y+1)):
-                adjacent.append((x,y+1))
-            if not layout.isWall((x,y-1)):
-                adjacent.append((x,y-1) )
-            if not layout.isWall((x+1,y)):
-                adjacent.append((x+1,y) )
-            if not layout.isWall((x-1,y)):
-                adjacent.append((x-1,y))
-            for other in adjacent:
-                if not other in dist:
-                    continue
-                oldDist = dist[other]
-                newDist = nodeDist+1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
-    return distances
+    """
+    Runs a breadth-first search from every open cell (every move costs 1)
+    and returns the resulting DistanceMatrix.
+    """
+    cells = layout.walls.asList(False)
+    index = dict([(cell, i) for i, cell in enumerate(cells)])
+    numCells = len(cells)
+    neighbors = []
+    for x, y in cells:
+        adjacent = [(x,y+1), (x,y-1), (x+1,y), (x-1,y)]
+        neighbors.append([index[other] for other in adjacent if other in index])
+
+    distances = array('H', [UNREACHABLE]) * (numCells * numCells)
+    for source in range(numCells):
+        row = source * numCells
+        distances[row + source] = 0
+        frontier = [source]
+        distance = 0
+        while frontier:
+            distance += 1
+            nextFrontier = []
+            for node in frontier:
+                for other in neighbors[node]:
+                    if distances[row + other] == UNREACHABLE:
+                        distances[row + other] = distance
+                        nextFrontier.append(other)
+            frontier = nextFrontier
+    return DistanceMatrix(cells, distances)
+
+
+####################################
+# ON-DISK CACHE OF DISTANCE MATRICES #
+####################################
+
+def getCacheDir(value):
+  """
+  The cache directory named by the PACMAN_DISTANCE_CACHE environment variable,
+  or None when it is unset, empty or 'None', which disables the cache.
+  """
+  if value == None or value.strip() in ('', 'None'): return None
+  return os.path.expanduser(value)
+
+# Directory of cached distance matrices; None (the default) disables the cache
+DISTANCE_CACHE_DIR = getCacheDir(os.environ.get('PACMAN_DISTANCE_CACHE'))
+
+# File layout: magic, numCells, then numCells (x, y) pairs and the
+# numCells * numCells distance matrix, all as little-endian unsigned shorts
+CACHE_MAGIC = 'PACDIST1'
+CACHE_HEADER = struct.Struct('<8sI')
+
+def getCachePath(walls):
+  "Cache files are content-addressed by the fingerprint of the walls."
+  return os.path.join(DISTANCE_CACHE_DIR, walls.fingerprint() + '.dist')
+
+class MappedDistances:
+  "Read-only array view of the distances stored in a memory-mapped cache file."
+  def __init__(self, buffer, offset, length):
+    self.buffer = buffer
+    self.offset = offset
+    self.length = length
+    self._unpack = struct.Struct('<H').unpack_from
+
+  def __getitem__(self, i):
+    if not 0 <= i < self.length: raise IndexError('distance index out of range')
+    return self._unpack(self.buffer, self.offset + 2 * i)[0]
+
+  def __len__(self):
+    return self.length
+
+def loadDistances(walls):
+  """
+  Memory-maps the cached DistanceMatrix for these walls.  Returns None if
+  the cache is disabled, or the file is missing or malformed.
+  """
+  if DISTANCE_CACHE_DIR == None: return None
+  try:
+    f = open(getCachePath(walls), 'rb')
+  except IOError:
+    return None
+  try:
+    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, numCells = CACHE_HEADER.unpack_from(buffer, 0)
+    cellsStart = CACHE_HEADER.size
+    distancesStart = cellsStart + 4 * numCells
+    if magic != CACHE_MAGIC or len(buffer) != distancesStart + 2 * numCells * numCells:
+      return None
+    coordinates = array('H', buffer[cellsStart:distancesStart])
+    if sys.byteorder == 'big': coordinates.byteswap()
+    cells = zip(coordinates[0::2], coordinates[1::2])
+    return DistanceMatrix(cells, MappedDistances(buffer, distancesStart, numCells * numCells))
+  except (ValueError, EnvironmentError, struct.error):
+    return None
+  finally:
+    f.close()
 
+def saveDistances(walls, distances):
+  """
+  Writes a DistanceMatrix to the cache.  The file is written under a
+  temporary name and renamed into place, so concurrent writers of the same
+  walls never expose a partial file to readers.  Failures are ignored: the
+  cache only saves time.
+  """
+  if DISTANCE_CACHE_DIR == None: return
+  tempPath = None
+  try:
+    if not os.path.isdir(DISTANCE_CACHE_DIR):
+      try:
+        os.makedirs(DISTANCE_CACHE_DIR)
+      except OSError:
+        if not os.path.isdir(DISTANCE_CACHE_DIR): raise
+    handle, tempPath = tempfile.mkstemp(suffix='.tmp', dir=DISTANCE_CACHE_DIR)
+    f = os.fdopen(handle, 'wb')
+    try:
+      coordinates = array('H', [c for cell in distances.cells for c in cell])
+      matrix = array('H', distances.distances)
+      if sys.byteorder == 'big':
+        coordinates.byteswap()
+        matrix.byteswap()
+      f.write(CACHE_HEADER.pack(CACHE_MAGIC, distances.numCells))
+      coordinates.tofile(f)
+      matrix.tofile(f)
+    finally:
+      f.close()
+    # mkstemp makes the file private; others sharing the directory must read it too
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(tempPath, 0644 & ~umask)
+    path = getCachePath(walls)
+    try:
+      os.rename(tempPath, path)
+    except OSError:
+      # Windows will not rename over an existing file; another writer won
+      if not os.path.exists(path): raise
+      os.remove(tempPath)
+  except EnvironmentError:
+    if tempPath != None and os.path.exists(tempPath): os.remove(tempPath)
 
 def getDistanceOnGrid(distances, pos1, pos2):
     key = (pos1, pos2)
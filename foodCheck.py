@@ -0,0 +1,119 @@
+# foodCheck.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A check of the food counter that GameStateData carries (see getNumFood).
+
+Seeded games of random agents are played with the rules of pacman.py and of
+busters.py on several layouts, and after every move the counter must equal
+the number of dots left in the food grid:
+
+  > python foodCheck.py
+  > python foodCheck.py --check 50 -p mediumClassic,trickyClassic -b test --seeds 0,1,2,3
+
+Every mismatch is printed, and the run exits with status 1 if there is
+any, so that scripts and continuous integration can rely on it.
+"""
+
+import sys, random
+import layout, pacman, busters, textDisplay
+from ghostAgents import RandomGhost
+
+class FoodCounterChecker:
+    "A Game recorder (see Game.recorder) that checks the food counter of every state."
+
+    def __init__(self, name):
+        self.name = name
+        self.numMoves = 0
+        self.mismatches = []
+
+    def checkState(self, state):
+        numFood, count = state.getNumFood(), state.getFood().count()
+        if numFood != count:
+            self.mismatches.append('%s, move %d: getNumFood() is %d but the food grid holds %d dots' % (
+                self.name, self.numMoves, numFood, count))
+
+    def addMove(self, agentIndex, action, state):
+        self.numMoves += 1
+        self.checkState(state)
+
+def checkFoodCounter(kind, layout, numGames, maxMoves=300, seed=0):
+    """
+    Plays numGames games of random agents on layout with the rules of kind,
+    'pacman' or 'busters', checking the food counter after every move.
+    Returns the number of moves checked and the list of the mismatches
+    found, described as strings.
+    """
+    numMoves = 0
+    mismatches = []
+    for i in range(numGames):
+        random.seed('%s-%s-%d' % (kind, seed, i))
+        # RandomGhost draws from the legal actions of its index, Pacman's for 0
+        ghosts = [RandomGhost(j + 1) for j in range(layout.getNumGhosts())]
+        if kind == 'pacman':
+            game = pacman.ClassicGameRules().newGame(layout, RandomGhost(0), ghosts, textDisplay.NullGraphics(), True)
+        else:
+            game = busters.BustersGameRules().newGame(layout, RandomGhost(0), ghosts, textDisplay.NullGraphics(), maxMoves)
+        game.recorder = FoodCounterChecker('%s game %d of seed %s' % (kind, i, seed))
+        game.recorder.checkState(game.state)
+        game.run()
+        numMoves += game.recorder.numMoves
+        mismatches += game.recorder.mismatches
+    return numMoves, mismatches
+
+if __name__ == '__main__':
+    """
+    The main function called when foodCheck.py is run
+    from the command line:
+
+    > python foodCheck.py
+
+    See the usage string for more details.
+    """
+    from optparse import OptionParser
+    parser = OptionParser("""
+    USAGE:      python foodCheck.py <options>
+    EXAMPLE:    python foodCheck.py --check 20 -p smallClassic -b test
+                  - plays 20 random games of each seed with each set of rules
+                    and checks the food counter after every move
+    """)
+    parser.add_option('--check', dest='check', type='int',
+                      help='the number of GAMES played for each layout and seed (default: 5)', metavar='GAMES', default=5)
+    parser.add_option('-p', '--pacmanLayouts', dest='pacmanLayouts',
+                      help='Comma-separated LAYOUT_FILES of the pacman games (default: smallClassic,mediumClassic,trickyClassic)',
+                      metavar='LAYOUT_FILES', default='smallClassic,mediumClassic,trickyClassic')
+    parser.add_option('-b', '--bustersLayouts', dest='bustersLayouts',
+                      help='Comma-separated LAYOUT_FILES of the busters games (default: test,openHunt,oneHunt)',
+                      metavar='LAYOUT_FILES', default='test,openHunt,oneHunt')
+    parser.add_option('-m', '--maxMoves', dest='maxMoves', type='int',
+                      help='Maximum number of MOVES of a busters game (default: 300)', metavar='MOVES', default=300)
+    parser.add_option('--seeds', dest='seeds', help='Comma-separated SEEDS of the games (default: 0,1,2)',
+                      metavar='SEEDS', default='0,1,2')
+    options, otherjunk = parser.parse_args()
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    numMismatches = 0
+    for kind, layoutNames in [('pacman', options.pacmanLayouts), ('busters', options.bustersLayouts)]:
+        for layoutName in layoutNames.split(','):
+            theLayout = layout.getLayout(layoutName)
+            if theLayout == None: raise Exception("The layout " + layoutName + " cannot be found")
+            for seed in options.seeds.split(','):
+                numMoves, mismatches = checkFoodCounter(kind, theLayout, options.check, options.maxMoves, seed)
+                for mismatch in mismatches: print mismatch
+                numMismatches += len(mismatches)
+                print 'Food counter:  %s on %s, seed %s: %d mismatches in %d moves of %d games' % (
+                    kind, layoutName, seed, len(mismatches), numMoves, options.check)
+    if numMismatches > 0:
+        print 'FAILED: %d mismatches' % numMismatches
+        sys.exit(1)
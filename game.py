@@ -20,7 +20,8 @@
 # John DeNero (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
 
 from util import *
-import time, os
+import time, os, hashlib, bisect
+import timing
 import traceback
 import sys
 
@@ -152,79 +153,107 @@ class AgentState:
         return state
 
     def getPosition(self):
-        if self.configuration == None: return None
-        return self.configuration.getPosition()
+        if self.configuration is None: return None
+        return self.configuration.pos
 
     def getDirection(self):
         return self.configuration.getDirection()
 
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
+    A 2-dimensional array of booleans backed by an integer bitset.  Data is accessed
     via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
     y vertical and the origin (0,0) in the bottom left corner.
 
+    Cell (x,y) is bit x * height + y of self.bits.  Python integers are immutable,
+    so copies share the bitset until one of them is written to, and count, hash,
+    equality and asList work on whole machine words instead of single cells.
+
     The __str__ method constructs an output that is oriented like a pacman board.
     """
     def __init__(self, width, height, initialValue=False, bitRepresentation=None):
-        if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
+        if not isinstance(initialValue, bool):
+            raise TypeError('Grids can only contain booleans, not %r' % (initialValue,))
         self.CELLS_PER_INT = 30
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(height)] for x in range(width)]
+        if initialValue:
+            self.bits = (1 << (width * height)) - 1
+        else:
+            self.bits = 0
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        if not 0 <= i < self.width:
+            if -self.width <= i < 0: i += self.width
+            else: raise IndexError('Grid index out of range')
+        return GridColumn(self, i)
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        column = self[key]
+        for y, value in enumerate(item):
+            column[y] = value
+
+    def __iter__(self):
+        for x in range(self.width):
+            yield GridColumn(self, x)
+
+    def __len__(self):
+        return self.width
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        cells = self._bitString().replace('1', 'T').replace('0', 'F')
+        out = [''.join([cells[x * self.height + y] for x in range(self.width)]) for y in range(self.height)]
         out.reverse()
-        return '\n'.join([''.join(x) for x in out])
+        return '\n'.join(out)
 
     def __eq__(self, other):
         if other == None: return False
-        return self.data == other.data
+        return self.bits == other.bits and self.height == other.height and self.width == other.width
+
+    def __ne__(self, other):
+        return not self == other
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(self.bits)
+
+    def fingerprint(self):
+        "Returns a hex digest identifying the size and contents of the grid"
+        return hashlib.sha1('%d,%d,%x' % (self.width, self.height, self.bits)).hexdigest()
 
     def copy(self):
         g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g.bits = self.bits
         return g
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        return self.copy()
 
     def count(self, item =True ):
-        return sum([x.count(item) for x in self.data])
+        numTrue = bin(self.bits).count('1')
+        if item: return numTrue
+        return self.width * self.height - numTrue
 
     def asList(self, key = True):
+        bits = self.bits
+        if not key: bits = ~bits & ((1 << (self.width * self.height)) - 1)
+        cells = bin(bits)[:1:-1]
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key: list.append( (x,y) )
+        i = cells.find('1')
+        while i >= 0:
+            list.append( divmod(i, self.height) )
+            i = cells.find('1', i + 1)
         return list
 
+    def _bitString(self):
+        "Returns the cells as a '0'/'1' string in cell index order"
+        return bin(self.bits)[:1:-1].ljust(self.width * self.height, '0')
+
     def packBits(self):
         """
         Returns an efficient int list representation
@@ -232,16 +261,10 @@ class Grid:
         (width, height, bitPackedInts...)
         """
         bits = [self.width, self.height]
-        currentInt = 0
-        for i in range(self.height * self.width):
-            bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
-                currentInt += 2 ** bit
-            if (i + 1) % self.CELLS_PER_INT == 0:
-                bits.append(currentInt)
-                currentInt = 0
-        bits.append(currentInt)
+        cells = self._bitString()
+        for start in range(0, len(cells) + 1, self.CELLS_PER_INT):
+            chunk = cells[start:start + self.CELLS_PER_INT]
+            bits.append(int(chunk.ljust(self.CELLS_PER_INT, '0'), 2))
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
@@ -253,25 +276,126 @@ class Grid:
         """
         Fills in data from a bit-level representation
         """
-        cell = 0
         for packed in bits:
-            for bit in self._unpackInt(packed, self.CELLS_PER_INT):
-                if cell == self.width * self.height: break
-                x, y = self._cellIndexToPosition(cell)
-                self[x][y] = bit
-                cell += 1
-
-    def _unpackInt(self, packed, size):
-        bools = []
-        if packed < 0: raise ValueError, "must be a positive integer"
-        for i in range(size):
-            n = 2 ** (self.CELLS_PER_INT - i - 1)
-            if packed >= n:
-                bools.append(True)
-                packed -= n
+            if packed < 0: raise ValueError, "must be a positive integer"
+        cells = ''.join([bin(packed)[2:].zfill(self.CELLS_PER_INT) for packed in bits])
+        cells = cells[:self.width * self.height]
+        if cells: self.bits = int(cells[::-1], 2)
+
+class GridColumn:
+    """
+    A view of column x of a Grid, so that grid[x][y] reads and writes the
+    grid's bitset directly.
+    """
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.offset = x * grid.height
+
+    def __getitem__(self, y):
+        height = self.grid.height
+        if not 0 <= y < height:
+            if -height <= y < 0: y += height
+            else: raise IndexError('Grid index out of range')
+        return (self.grid.bits >> (self.offset + y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        height = self.grid.height
+        if not 0 <= y < height:
+            if -height <= y < 0: y += height
+            else: raise IndexError('Grid index out of range')
+        bit = 1 << (self.offset + y)
+        if value:
+            self.grid.bits |= bit
+        else:
+            self.grid.bits &= ~bit
+
+    def __iter__(self):
+        bits = self.grid.bits >> self.offset
+        for y in range(self.grid.height):
+            yield (bits >> y) & 1 == 1
+
+    def __len__(self):
+        return self.grid.height
+
+class FoodIndex:
+    """
+    An immutable index of the food in a Grid for nearest-food queries.
+
+    Food positions are kept in sorted columns, so a query scans the columns
+    outward from the query position and stops as soon as the horizontal
+    offset alone rules out anything closer.  A maze distance is never
+    smaller than the Manhattan distance, so the same scan answers maze
+    distance queries, measuring only the food that could still be closer.
+    """
+    def __init__(self, food, columns=None):
+        self.width, self.height = food.width, food.height
+        self.bits = food.bits
+        if columns == None:
+            columns = [[] for x in range(self.width)]
+            for x, y in food.asList():
+                columns[x].append(y)
+            columns = [tuple(ys) for ys in columns]
+        self.columns = columns
+        self.count = sum([len(ys) for ys in columns])
+
+    def update(self, food):
+        """
+        Returns an index of the Grid food, reusing this index when food only
+        differs from it by eaten cells.
+        """
+        if food.bits == self.bits: return self
+        if food.width != self.width or food.height != self.height or food.bits & ~self.bits:
+            return FoodIndex(food)
+        columns = list(self.columns)
+        removed = self.bits & ~food.bits
+        while removed:
+            bit = removed & -removed
+            removed ^= bit
+            x, y = divmod(bit.bit_length() - 1, self.height)
+            columns[x] = tuple([c for c in columns[x] if c != y])
+        return FoodIndex(food, columns)
+
+    def getNearest(self, pos, getDistance=None):
+        """
+        Returns (distance, foodPosition) for the food closest to pos, or None
+        if there is no food left.  Distances are Manhattan distances unless a
+        getDistance(pos1, pos2) function, such as Distancer.getDistance, is
+        given.
+        """
+        if self.count == 0: return None
+        x, y = pos
+        best = None
+        left = min(max(int(x), 0), self.width - 1)
+        right = left + 1
+        while left >= 0 or right < self.width:
+            # Visit the remaining column nearest to x
+            if right >= self.width or (left >= 0 and x - left <= right - x):
+                column = left
+                left -= 1
             else:
-                bools.append(False)
-        return bools
+                column = right
+                right += 1
+            dx = abs(column - x)
+            if best != None and dx >= best[0]: break
+            ys = self.columns[column]
+            if len(ys) == 0: continue
+            # Walk outward from y, nearest rows first
+            below = bisect.bisect_left(ys, y) - 1
+            above = below + 1
+            while below >= 0 or above < len(ys):
+                if above >= len(ys) or (below >= 0 and y - ys[below] <= ys[above] - y):
+                    foodY = ys[below]
+                    below -= 1
+                else:
+                    foodY = ys[above]
+                    above += 1
+                distance = dx + abs(foodY - y)
+                if best != None and distance >= best[0]: break
+                if getDistance != None:
+                    distance = getDistance(pos, (column, foodY))
+                    if best != None and distance >= best[0]: continue
+                best = (distance, (column, foodY))
+        return best
 
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
@@ -369,19 +493,28 @@ class Actions:
 
 class GameStateData:
     """
-
+    The layout, food grid, capsule list and agent states are shared with the
+    predecessor and only copied when they change: the food grid's bits are an
+    immutable int, the capsule list is replaced rather than edited, and the
+    game rules modify agent states through getAgentStateForUpdate.
     """
     def __init__( self, prevState = None ):
         """
         Generates a new data packet by copying information from its predecessor.
         """
+        self._ownedAgents = set()
+        self._foodIndex = None
         if prevState != None:
             self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
+            self.numFood = prevState.numFood
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._foodIndex = prevState._foodIndex
+            # The agent states are now shared, so neither side may edit them
+            prevState._ownedAgents = set()
 
         self._foodEaten = None
         self._foodAdded = None
@@ -393,20 +526,53 @@ class GameStateData:
 
     def deepCopy( self ):
         state = GameStateData( self )
-        state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def makeObservation( self ):
+        """
+        Returns what deepCopy does for an agent to observe.  The view gets its
+        own food grid, capsule list and copies of the agent states (which it
+        owns, as the copies are shared with nothing), so nothing an agent
+        writes to its observation reaches the game.  The food grid's copy is
+        O(1), as it shares the immutable bits until either side changes them.
+        """
+        view = self.deepCopy()
+        view.capsules = self.capsules[:]
+        view.agentStates = [s and s.copy() for s in self.agentStates]
+        view._ownedAgents = set( range( len( view.agentStates ) ) )
+        return view
+
     def copyAgentStates( self, agentStates ):
         copiedStates = []
         for agentState in agentStates:
             copiedStates.append( agentState.copy() )
         return copiedStates
 
+    def getFoodIndex( self ):
+        """
+        Returns a FoodIndex of self.food.  The index is handed on from state to
+        state and only updated for the food eaten in between.
+        """
+        if self._foodIndex == None:
+            self._foodIndex = FoodIndex( self.food )
+        else:
+            self._foodIndex = self._foodIndex.update( self.food )
+        return self._foodIndex
+
+    def getAgentStateForUpdate( self, agentIndex ):
+        """
+        Returns agentStates[agentIndex] for the game rules to modify, copying
+        it first if it may still be shared with another state.
+        """
+        if agentIndex not in self._ownedAgents:
+            self.agentStates[agentIndex] = self.agentStates[agentIndex].copy()
+            self._ownedAgents.add( agentIndex )
+        return self.agentStates[agentIndex]
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -433,13 +599,13 @@ class GameStateData:
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
         if type(self.food) == type((1,2)):
             self.food = reconstituteGrid(self.food)
-        for x in range(width):
-            for y in range(height):
-                food, walls = self.food, self.layout.walls
-                map[x][y] = self._foodWallStr(food[x][y], walls[x][y])
+        map = [[' '] * height for x in range(width)]
+        for x, y in self.layout.walls.asList():
+            map[x][y] = self._foodWallStr(False, True)
+        for x, y in self.food.asList():
+            map[x][y] = self._foodWallStr(True, False)
 
         for agentState in self.agentStates:
             if agentState == None: continue
@@ -454,7 +620,9 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        rows = [''.join([map[x][y] for x in range(width)]) for y in range(height)]
+        rows.reverse()
+        return '\n'.join(rows) + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr( self, hasFood, hasWall ):
         if hasFood:
@@ -488,6 +656,7 @@ class GameStateData:
         Creates an initial game state from a layout array (see layout.py).
         """
         self.food = layout.food.copy()
+        self.numFood = self.food.count()
         #self.capsules = []
         self.capsules = layout.capsules[:]
         self.layout = layout
@@ -501,6 +670,7 @@ class GameStateData:
                 if numGhosts == numGhostAgents: continue # Max ghosts reached already
                 else: numGhosts += 1
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
+        self._ownedAgents = set( range( len( self.agentStates ) ) )
         self._eaten = [False for a in self.agentStates]
 
 try:
@@ -509,14 +679,37 @@ try:
 except:
     _BOINC_ENABLED = False
 
+AGENT_HOOKS = ['registerInitialState', 'observationFunction', 'getAction', 'final']
+
+def getAgentHooks( agent ):
+    """
+    Returns the capability table of an agent: a dictionary from each name in
+    AGENT_HOOKS to the agent's bound method, or None if it has no such method.
+    """
+    return dict([(name, getattr(agent, name, None)) for name in AGENT_HOOKS])
+
+def isNullDisplay( display ):
+    "Returns whether display draws nothing, as the checkNullDisplay of NullGraphics says."
+    checkNullDisplay = getattr(display, 'checkNullDisplay', None)
+    return checkNullDisplay != None and checkNullDisplay()
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
+
+    The hooks of every agent are looked up once, when the game is created;
+    see getAgentHooks.  The moves of the agents are timed by a
+    timing.MoveTimer, which also enforces the time limits of the rules when
+    catchExceptions is set.  Setting profiler to a timing.GameProfiler
+    before running the game measures each phase of every move as well, and
+    setting recorder to a recording.GameRecorder records the game.  Null
+    displays (see isNullDisplay) are not called at all.
     """
 
     def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
         self.agentCrashed = False
         self.agents = agents
+        self.agentHooks = [getAgentHooks(agent) for agent in agents]
         self.display = display
         self.rules = rules
         self.startingIndex = startingIndex
@@ -527,6 +720,9 @@ class Game:
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
+        self.timer = timing.MoveTimer(len(agents))
+        self.profiler = None
+        self.recorder = None
         import cStringIO
         self.agentOutput = [cStringIO.StringIO() for agent in agents]
 
@@ -566,7 +762,15 @@ class Game:
         """
         Main control loop for game play.
         """
-        self.display.initialize(self.state.data)
+        if self.catchExceptions: self.timer.start()
+        try:
+            self._runLoop()
+        finally:
+            self.timer.stop()
+
+    def _runLoop( self ):
+        headless = isNullDisplay(self.display)
+        if not headless: self.display.initialize(self.state.data)
         self.numMoves = 0
 
         ###self.display.initialize(self.state.makeObservation(1).data)
@@ -582,16 +786,14 @@ class Game:
                 self._agentCrash(i, quiet=True)
                 return
 
-            if ("registerInitialState" in dir(agent)):
+            registerInitialState = self.agentHooks[i]['registerInitialState']
+            if registerInitialState != None:
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
                         try:
-                            start_time = time.time()
-                            timed_func(self.state.deepCopy())
-                            time_taken = time.time() - start_time
-                            self.totalAgentTimes[i] += time_taken
+                            self.timer.call(self.rules.getMaxStartupTime(i), registerInitialState, self.state.makeObservation(i))
+                            self.totalAgentTimes[i] += self.timer.lastTime
                         except TimeoutFunctionException:
                             print >>sys.stderr, "Agent %d ran out of time on startup!" % i
                             self.unmute()
@@ -603,53 +805,66 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    registerInitialState(self.state.makeObservation(i))
                 ## TODO: could this exceed the total time
                 self.unmute()
 
         agentIndex = self.startingIndex
         numAgents = len( self.agents )
+        observationFunctions = [hooks['observationFunction'] for hooks in self.agentHooks]
+        getActions = [hooks['getAction'] for hooks in self.agentHooks]
+        perfCounter = timing.perfCounter
+        recordMoves = [histogram.add for histogram in self.timer.histograms]
+        updateDisplay = self.display.update
+        process = self.rules.process
+        addMove = None
+        if self.recorder != None: addMove = self.recorder.addMove
+        measure = None
+        if self.profiler != None:
+            measure = self.profiler.measure
+            wrap = self.profiler.wrap
+            observationFunctions = [wrap('observationFunction', i, f) for i, f in enumerate(observationFunctions)]
+            getActions = [wrap('getAction', i, f) for i, f in enumerate(getActions)]
         step = 0
         while not self.gameOver:
             # Fetch the next agent
-            agent = self.agents[agentIndex]
+            observationFunction = observationFunctions[agentIndex]
+            getAction = getActions[agentIndex]
             move_time = 0
             skip_action = False
                 
             # Generate an observation of the state
-            if 'observationFunction' in dir( agent ):
+            if observationFunction != None:
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
                         try:
-                            start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            observation = self.timer.call(self.rules.getMoveTimeout(agentIndex), observationFunction, self.state.makeObservation(agentIndex))
                         except TimeoutFunctionException:
                             skip_action = True
-                        move_time += time.time() - start_time
+                        move_time += self.timer.lastTime
                         self.unmute()
                     except Exception,data:
                         self._agentCrash(agentIndex, quiet=False)
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(self.state.deepCopy())
+                    start_time = perfCounter()
+                    observation = observationFunction(self.state.makeObservation(agentIndex))
+                    move_time += perfCounter() - start_time
                 self.unmute()
             else:
-                observation = self.state.deepCopy()
+                observation = self.state.makeObservation(agentIndex)
             # Solicit an action
             action = None
             step += 1
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                     try:
-                        start_time = time.time()
                         if skip_action:
                             raise TimeoutFunctionException()
-                        action = timed_func( observation )
+                        action = self.timer.call(self.rules.getMoveTimeout(agentIndex) - move_time, getAction, observation)
                     except TimeoutFunctionException:
                         print >>sys.stderr, "Agent %d timed out on a single move!" % agentIndex
                         self.agentTimeout = True
@@ -657,7 +872,7 @@ class Game:
                         self.unmute()
                         return
 
-                    move_time += time.time() - start_time
+                    move_time += self.timer.lastTime
 
                     if move_time > self.rules.getMoveWarningTime(agentIndex):
                         self.totalAgentTimeWarnings[agentIndex] += 1
@@ -683,29 +898,39 @@ class Game:
                     self.unmute()
                     return
             else:
-                action = agent.getAction(observation)
+                start_time = perfCounter()
+                action = getAction(observation)
+                move_time += perfCounter() - start_time
             self.unmute()
+            recordMoves[agentIndex](move_time)
 
             # Execute the action
             self.moveHistory.append( (agentIndex, action) )
             if self.catchExceptions:
                 try:
-                    self.state = self.state.generateSuccessor( agentIndex, action )
+                    if measure == None: self.state = self.state.generateSuccessor( agentIndex, action )
+                    else: self.state = measure('generateSuccessor', agentIndex, self.state.generateSuccessor, agentIndex, action)
                 except Exception,data:
                     self.mute(agentIndex)
                     self._agentCrash(agentIndex)
                     self.unmute()
                     return
-            else:
+            elif measure == None:
                 self.state = self.state.generateSuccessor( agentIndex, action )
+            else:
+                self.state = measure('generateSuccessor', agentIndex, self.state.generateSuccessor, agentIndex, action)
+            if addMove != None: addMove( agentIndex, action, self.state )
 
             # Change the display
-            self.display.update( self.state.data )
+            if headless: pass
+            elif measure == None: updateDisplay( self.state.data )
+            else: measure('display.update', agentIndex, updateDisplay, self.state.data)
             ###idx = agentIndex - agentIndex % 2 + 1
             ###self.display.update( self.state.makeObservation(idx).data )
 
             # Allow for game specific conditions (winning, losing, etc.)
-            self.rules.process(self.state, self)
+            if measure == None: process(self.state, self)
+            else: measure('rules.process', agentIndex, process, self.state, self)
             # Track progress
             if agentIndex == numAgents + 1: self.numMoves += 1
             # Next agent
@@ -715,15 +940,16 @@ class Game:
                 boinc.set_fraction_done(self.getProgress())
 
         # inform a learning agent of the game result
-        for agentIndex, agent in enumerate(self.agents):
-            if "final" in dir( agent ) :
+        for agentIndex, hooks in enumerate(self.agentHooks):
+            final = hooks['final']
+            if final != None:
                 try:
                     self.mute(agentIndex)
-                    agent.final( self.state )
+                    final( self.state )
                     self.unmute()
                 except Exception,data:
                     if not self.catchExceptions: raise
                     self._agentCrash(agentIndex)
                     self.unmute()
                     return
-        self.display.finish()
+        if not headless: self.display.finish()
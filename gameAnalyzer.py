@@ -0,0 +1,316 @@
+# gameAnalyzer.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Headless analysis of recorded games (see recording.py).
+
+Every game of the recording files given is replayed through the rules
+engine, without a display, and each metric chosen sees every move:
+
+  > python gameAnalyzer.py -m score,foodEaten,captureTicks -w 4 recorded-games-*.rec
+
+A metric is a class with the interface of Metric below.  Those in METRICS
+are known by name; any other is loaded as module.ClassName from the Python
+path, so a new metric needs no change here:
+
+  > python gameAnalyzer.py -m myMetrics.PowerPellets games.rec
+
+Metrics that only need the outcome of a game (needsStates = False) are
+read from the recording without replaying it.  The games are spread over a
+pool of worker processes, and the results printed as a table of one row per
+game followed by the aggregate of each metric over all games.
+"""
+
+import sys, os
+import util, recording
+
+FORMATS = ['table', 'csv']
+
+class Metric:
+    """
+    A value computed from one game.  start is called with the record and the
+    initial state, update after every move with the tick, the agent that moved,
+    its action and the state it led to, and getValue at the end.  aggregate
+    combines the values of all games.
+    """
+    name = None
+    needsStates = True # False if getValue only needs the record
+
+    def start(self, record, state):
+        pass
+
+    def update(self, tick, agentIndex, action, state):
+        pass
+
+    def getValue(self):
+        raise Exception('Metric %s has no value' % self.name)
+
+    def aggregate(self, values):
+        "Returns the mean of the values that are numbers, if any."
+        numbers = [v for v in values if isinstance(v, (int, long, float)) and not isinstance(v, bool)]
+        if len(numbers) == 0: return None
+        return sum(numbers) / float(len(numbers))
+
+class Score(Metric):
+    "The final score."
+    name = 'score'
+    needsStates = False
+
+    def start(self, record, state):
+        self.value = record.score
+
+    def getValue(self):
+        return self.value
+
+class Win(Metric):
+    "Whether Pacman won; aggregated into the win rate."
+    name = 'win'
+    needsStates = False
+
+    def start(self, record, state):
+        self.value = record.win
+
+    def getValue(self):
+        return self.value
+
+    def aggregate(self, values):
+        return values.count(True) / float(len(values))
+
+class Ticks(Metric):
+    "The number of moves of all agents."
+    name = 'ticks'
+    needsStates = False
+
+    def start(self, record, state):
+        self.value = len(record)
+
+    def getValue(self):
+        return self.value
+
+class FoodEaten(Metric):
+    "The number of food dots Pacman ate."
+    name = 'foodEaten'
+
+    def start(self, record, state):
+        self.initialFood = state.getNumFood()
+        self.state = state
+
+    def update(self, tick, agentIndex, action, state):
+        self.state = state
+
+    def getValue(self):
+        return self.initialFood - self.state.getNumFood()
+
+class ScoreCurve(Metric):
+    """
+    The score every CURVE_STEP ticks, ending with the final score; aggregated
+    into the mean curve over the games, which keep their final score once
+    they are over.
+    """
+    name = 'scoreCurve'
+    CURVE_STEP = 100
+
+    def start(self, record, state):
+        self.curve = [state.getScore()]
+        self.state = state
+        self.tick = 0
+
+    def update(self, tick, agentIndex, action, state):
+        self.state = state
+        self.tick = tick
+        if tick % self.CURVE_STEP == 0: self.curve.append(state.getScore())
+
+    def getValue(self):
+        if self.tick % self.CURVE_STEP == 0: return self.curve
+        return self.curve + [self.state.getScore()]
+
+    def aggregate(self, values):
+        length = max([len(curve) for curve in values])
+        padded = [curve + [curve[-1]] * (length - len(curve)) for curve in values]
+        return [sum(column) / float(len(values)) for column in zip(*padded)]
+
+class CaptureTicks(Metric):
+    """
+    The tick at which each ghost was captured, in the order of the captures.
+    In busters a captured ghost leaves the living ghosts; in pacman an eaten
+    ghost jumps back to its starting position.  Aggregated into the mean
+    number of captures per game.
+    """
+    name = 'captureTicks'
+
+    def start(self, record, state):
+        self.ticks = []
+        self.busters = record.kind == 'busters'
+        self.positions = [s.getPosition() for s in state.data.agentStates]
+
+    def update(self, tick, agentIndex, action, state):
+        if self.busters:
+            for i in range(1, len(self.positions)):
+                if not state.livingGhosts[i] and self.positions[i] != None: # Captured just now
+                    self.ticks.append(tick)
+                    self.positions[i] = None
+            return
+        for i in range(1, len(self.positions)):
+            position = state.data.agentStates[i].getPosition()
+            if util.manhattanDistance(position, self.positions[i]) > 1:
+                self.ticks.append(tick)
+            self.positions[i] = position
+
+    def getValue(self):
+        return self.ticks
+
+    def aggregate(self, values):
+        return sum([len(ticks) for ticks in values]) / float(len(values))
+
+METRICS = dict([(metric.name, metric) for metric in [Score, Win, Ticks, FoodEaten, ScoreCurve, CaptureTicks]])
+DEFAULT_METRICS = ['score', 'win', 'ticks', 'foodEaten', 'captureTicks']
+
+def loadMetric(name):
+    "Returns the metric class called name: one of METRICS, or module.ClassName."
+    if name in METRICS: return METRICS[name]
+    if '.' not in name:
+        raise Exception('Unknown metric %s; use one of %s or module.ClassName' % (name, ', '.join(sorted(METRICS.keys()))))
+    moduleName, className = name.rsplit('.', 1)
+    return getattr(__import__(moduleName), className)
+
+def analyzeRecord(record, metricClasses):
+    "Returns the values of the metrics over one game, replaying it only if one of them needs it."
+    metrics = [metricClass() for metricClass in metricClasses]
+    needsStates = len([m for m in metrics if m.needsStates]) > 0
+    state = None
+    if needsStates: state = record.getInitialState()
+    for metric in metrics: metric.start(record, state)
+    if needsStates:
+        updates = [m.update for m in metrics if m.needsStates]
+        numAgents = record.numAgents
+        actions = recording.ACTION_CODES
+        for t, code in enumerate(record.actions):
+            agentIndex = t % numAgents
+            action = actions[code]
+            state = state.generateSuccessor(agentIndex, action)
+            for update in updates: update(t + 1, agentIndex, action, state)
+    return [metric.getValue() for metric in metrics]
+
+readers = {} # Path -> RecordingReader, kept by each process across its jobs
+
+def analyzeGames( job ):
+    "Returns the metric values of a list of games of one recording file."
+    path, gameIndices, metricNames = job
+    import pacman
+    pacman.GameState.trackExplored = False # Nothing counts the states replays explore
+    if path not in readers: readers[path] = recording.RecordingReader(path)
+    metricClasses = [loadMetric(name) for name in metricNames]
+    return [analyzeRecord(readers[path].getRecord(i), metricClasses) for i in gameIndices]
+
+def analyzeRecordings( paths, metricNames, numWorkers=1, chunkSize=100 ):
+    """
+    Returns a list of (path, gameIndex, values) for every game of the
+    recording files at paths, the values being those of metricNames.  Chunks
+    of chunkSize games are shared among numWorkers processes.
+    """
+    games = []
+    jobs = []
+    for path in paths:
+        numGames = len(recording.RecordingReader(path))
+        for start in range(0, numGames, chunkSize):
+            indices = range(start, min(start + chunkSize, numGames))
+            games += [(path, i) for i in indices]
+            jobs.append((path, indices, metricNames))
+    if numWorkers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(numWorkers)
+        try:
+            results = pool.map(analyzeGames, jobs, 1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(analyzeGames, jobs)
+    values = [v for chunk in results for v in chunk]
+    return [(path, i, v) for (path, i), v in zip(games, values)]
+
+def formatValue(value):
+    if value == None: return '-'
+    if isinstance(value, bool): return ['Loss', 'Win'][int(value)]
+    if isinstance(value, float):
+        if value == int(value): return str(int(value))
+        return '%.2f' % value
+    if isinstance(value, (list, tuple)): return ' '.join([formatValue(v) for v in value])
+    return str(value)
+
+def formatTable( rows, format='table' ):
+    "Returns rows of strings, the first of which is the header, as an aligned table or as CSV."
+    if format == 'csv':
+        import csv, cStringIO
+        out = cStringIO.StringIO()
+        csv.writer(out).writerows(rows)
+        return out.getvalue()
+    widths = [max([len(row[i]) for row in rows]) for i in range(len(rows[0]))]
+    lines = ['  '.join([cell.ljust(width) for cell, width in zip(row, widths)]).rstrip() for row in rows]
+    lines.insert(1, '  '.join(['-' * width for width in widths]))
+    return '\n'.join(lines) + '\n'
+
+def readCommand( argv ):
+    """
+    Processes the command used to run the analyzer from the command line.
+    """
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python gameAnalyzer.py <options> RECORDING_FILE...
+    EXAMPLE:    python gameAnalyzer.py -w 4 -m score,win,scoreCurve recorded-games-*.rec
+                  - replays every game of the files on 4 processes and prints their metrics
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-m', '--metrics', dest='metrics',
+                      help='Comma-separated METRICS to compute, among %s or module.ClassName (default: %s)' % (', '.join(sorted(METRICS.keys())), ','.join(DEFAULT_METRICS)),
+                      metavar='METRICS', default=','.join(DEFAULT_METRICS))
+    parser.add_option('-w', '--workers', dest='numWorkers', type='int',
+                      help='Number of WORKERS processes replaying the games (default: 1)', metavar='WORKERS', default=1)
+    parser.add_option('-s', '--summary', action='store_true', dest='summary',
+                      help='Prints only the aggregate of each metric, not a row per game', default=False)
+    parser.add_option('--format', dest='format', type='choice', choices=FORMATS,
+                      help='How to print the results: ' + ' or '.join(FORMATS) + ' (default: table)', default='table')
+    parser.add_option('--curveStep', dest='curveStep', type='int',
+                      help='Ticks between two points of a scoreCurve (default: %d)' % ScoreCurve.CURVE_STEP,
+                      metavar='TICKS', default=ScoreCurve.CURVE_STEP)
+
+    options, paths = parser.parse_args(argv)
+    if len(paths) == 0:
+        raise Exception('No recording file given')
+    metricNames = options.metrics.split(',')
+    for name in metricNames: loadMetric(name) # Fail before any work on unknown metrics
+    ScoreCurve.CURVE_STEP = options.curveStep
+    return paths, metricNames, options
+
+if __name__ == '__main__':
+    """
+    The main function called when gameAnalyzer.py is run
+    from the command line:
+
+    > python gameAnalyzer.py games.rec
+
+    See the usage string for more details.
+    """
+    paths, metricNames, options = readCommand( sys.argv[1:] )
+    results = analyzeRecordings(paths, metricNames, options.numWorkers)
+    metricClasses = [loadMetric(name) for name in metricNames]
+    rows = [['file', 'game'] + metricNames]
+    if not options.summary:
+        for path, i, values in results:
+            rows.append([os.path.basename(path), str(i)] + [formatValue(v) for v in values])
+    if len(results) > 0:
+        aggregates = [metricClass().aggregate([values[j] for path, i, values in results])
+                      for j, metricClass in enumerate(metricClasses)]
+        rows.append(['all', str(len(results))] + [formatValue(v) for v in aggregates])
+    sys.stdout.write(formatTable(rows, options.format))
@@ -0,0 +1,215 @@
+# gameBenchmark.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Benchmarks of the game engine, each timing the current code against a
+replica of what the engine did before it was changed:
+
+  > python gameBenchmark.py --states
+      - successors and observations of long games, with copy-on-write
+        GameStateData against copying every agent state, the food grid and
+        the layout for each of them
+  > python gameBenchmark.py --layouts
+      - the layout copy of every observation, with shared layouts against
+        parsing the layout text again
+  > python gameBenchmark.py --engine
+      - the moves of Game.run with agents that only stop, with the hooks of
+        the agents looked up once per game against on every move
+
+The games are played by random agents, with the rules of busters.py on
+bigHunt and of pacman.py on originalClassic by default, and their moves
+are replayed for the timings.  Pacman games are short, so several seeded
+games are played until they add up to the number of moves asked for.
+"""
+
+import random
+import layout, pacman, busters, textDisplay
+from game import Agent, GameStateData
+from ghostAgents import RandomGhost, StaticGhost
+from timing import perfCounter
+
+class MoveCollector:
+    "A Game recorder (see Game.recorder) that keeps every agent index and action."
+
+    def __init__(self):
+        self.moves = []
+
+    def addMove(self, agentIndex, action, state):
+        self.moves.append((agentIndex, action))
+
+def playGames(kind, layout, numMoves, seed=0):
+    """
+    Plays seeded games of random agents on layout with the rules of kind,
+    'pacman' or 'busters', until they add up to numMoves moves.  Returns a
+    list of (initialState, moves) for the games, moves being the list of
+    their (agentIndex, action).
+    """
+    games = []
+    total = 0
+    while total < numMoves:
+        random.seed('%s-%s-%d' % (kind, seed, len(games)))
+        # RandomGhost draws from the legal actions of its index, Pacman's for 0
+        ghosts = [RandomGhost(j + 1) for j in range(layout.getNumGhosts())]
+        if kind == 'pacman':
+            game = pacman.ClassicGameRules().newGame(layout, RandomGhost(0), ghosts, textDisplay.NullGraphics(), True)
+        else:
+            # A pacman move and a move of every ghost count as one busters move
+            maxMoves = (numMoves - total) / (layout.getNumGhosts() + 1) + 1
+            game = busters.BustersGameRules().newGame(layout, RandomGhost(0), ghosts, textDisplay.NullGraphics(), maxMoves)
+        initialState = game.state
+        game.recorder = MoveCollector()
+        game.run()
+        moves = game.recorder.moves[:numMoves - total]
+        games.append((initialState, moves))
+        total += len(moves)
+    return games
+
+class LayoutBefore(layout.Layout):
+    "A Layout parsed as it was before layouts were shared, without the move tables built for them since."
+
+    def initializeMoveTables(self):
+        pass
+
+def copyDataBefore(data):
+    """
+    Copies a GameStateData the way the engine did before it shared data
+    between states: every agent state, the food grid and the capsule list
+    are copied, and the layout is parsed again from its text.
+    """
+    copy = GameStateData(data)
+    copy.agentStates = copy.copyAgentStates(data.agentStates)
+    copy.food = data.food.copy()
+    copy.capsules = data.capsules[:]
+    copy.layout = LayoutBefore(data.layout.layoutText)
+    return copy
+
+def timeStates(games, before=False):
+    """
+    Returns the seconds it takes to replay the moves of games, generating
+    the successor of every move and the observation of the agent to move.
+    Before, each observation is a full copy (see copyDataBefore) and each
+    successor copies every agent state.
+    """
+    start = perfCounter()
+    for state, moves in games:
+        for agentIndex, action in moves:
+            observation = state.makeObservation(agentIndex)
+            if before: observation.data = copyDataBefore(state.data)
+            state = state.generateSuccessor(agentIndex, action)
+            if before: state.data.agentStates = state.data.copyAgentStates(state.data.agentStates)
+    return perfCounter() - start
+
+def timeLayoutCopies(games, before=False):
+    """
+    Returns the seconds it takes to copy the layout once for each move of
+    games, as every observation did.  Before, each copy parses the layout
+    text again (see LayoutBefore); now Layout.deepCopy shares the layout.
+    """
+    start = perfCounter()
+    for state, moves in games:
+        theLayout = state.data.layout
+        for move in moves:
+            if before: copy = LayoutBefore(theLayout.layoutText)
+            else: copy = theLayout.deepCopy()
+    return perfCounter() - start
+
+class ProxyAgent(Agent):
+    """
+    Plays like agent.  Before, it also looks the hooks of agent up with
+    dir() on every move, as Game.run did before it looked them up once per
+    game; the proxy itself costs the same either way.
+    """
+
+    def __init__(self, agent, before):
+        Agent.__init__(self, agent.index)
+        self.agent = agent
+        self.before = before
+
+    def getAction(self, state):
+        if self.before: 'observationFunction' in dir(self.agent)
+        return self.agent.getAction(state)
+
+def timeEngine(games, before=False):
+    """
+    Returns the seconds it takes Game.run to play a busters game of as many
+    moves as games on their layout, without a display and with agents that
+    only stop, so that the time is that of the engine.  Its states are the
+    same as those of the other benchmarks, so only the hooks differ.
+    """
+    theLayout = games[0][0].data.layout
+    numMoves = sum([len(moves) for state, moves in games])
+    numAgents = theLayout.getNumGhosts() + 1
+    agents = [ProxyAgent(StaticGhost(i), before) for i in range(numAgents)]
+    game = busters.BustersGameRules().newGame(theLayout, agents[0], agents[1:], textDisplay.NullGraphics(),
+                                              (numMoves + numAgents - 1) / numAgents)
+    start = perfCounter()
+    game.run()
+    return perfCounter() - start
+
+def compare(name, timeFunction, games, numMoves, repeats):
+    """
+    Prints the best of repeats timings, before and now, in microseconds per
+    move.  The two are timed in turn, so that both see the same load.
+    """
+    timings = [(timeFunction(games, True), timeFunction(games, False)) for i in range(repeats)]
+    before = min([b for b, n in timings])
+    now = min([n for b, n in timings])
+    print '%-28s before %7.1fus  now %7.1fus  per move (%.1fx)' % (
+        name, 1e6 * before / numMoves, 1e6 * now / numMoves, before / now)
+
+if __name__ == '__main__':
+    """
+    The main function called when gameBenchmark.py is run
+    from the command line:
+
+    > python gameBenchmark.py --states
+
+    See the usage string for more details.
+    """
+    from optparse import OptionParser
+    parser = OptionParser("""
+    USAGE:      python gameBenchmark.py <options>
+    EXAMPLE:    python gameBenchmark.py --states -n 5000
+                  - times the successors and observations of 5000 moves of
+                    busters on bigHunt and of pacman on originalClassic
+    """)
+    parser.add_option('--states', action='store_true', dest='states',
+                      help='Times successors and observations of long games', default=False)
+    parser.add_option('--layouts', action='store_true', dest='layouts',
+                      help='Times the layout copies of the observations', default=False)
+    parser.add_option('--engine', action='store_true', dest='engine',
+                      help='Times the engine playing agents that only stop (busters only)', default=False)
+    parser.add_option('-b', '--bustersLayout', dest='bustersLayout', help='the LAYOUT_FILE of the busters games (default: bigHunt)',
+                      metavar='LAYOUT_FILE', default='bigHunt')
+    parser.add_option('-p', '--pacmanLayout', dest='pacmanLayout', help='the LAYOUT_FILE of the pacman games (default: originalClassic)',
+                      metavar='LAYOUT_FILE', default='originalClassic')
+    parser.add_option('-n', '--numMoves', dest='numMoves', type='int',
+                      help='the number of agent MOVES timed for each layout (default: 2000)', metavar='MOVES', default=2000)
+    parser.add_option('-r', '--repeats', dest='repeats', type='int',
+                      help='the best of TIMES timings is kept (default: 3)', metavar='TIMES', default=3)
+    parser.add_option('--seed', dest='seed', help='SEED of the games (default: 0)', metavar='SEED', default='0')
+    options, otherjunk = parser.parse_args()
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    for kind, layoutName in [('busters', options.bustersLayout), ('pacman', options.pacmanLayout)]:
+        theLayout = layout.getLayout(layoutName)
+        if theLayout == None: raise Exception("The layout " + layoutName + " cannot be found")
+        games = playGames(kind, theLayout, options.numMoves, options.seed)
+        print '%s on %s, %d moves of %d games:' % (kind, layoutName, options.numMoves, len(games))
+        if options.states:
+            compare('successors + observations', timeStates, games, options.numMoves, options.repeats)
+        if options.layouts:
+            compare('layout copies', timeLayoutCopies, games, options.numMoves, options.repeats)
+        if options.engine and kind == 'busters':
+            compare('engine with stopping agents', timeEngine, games, options.numMoves, options.repeats)
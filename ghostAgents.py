@@ -17,14 +17,42 @@ from game import Actions
 from game import Directions
 import random
 from util import manhattanDistance
-import util
+import util, sampling
+
+# The draws prepared by a ghost are all dropped beyond this many
+DRAW_CACHE_SIZE = 4096
 
 class GhostAgent( Agent ):
+    drawLayout = None # The layout of the draws kept
+    draws = None      # (transition key, configuration, scaredTimer) -> (cdf, actions)
+
     def __init__( self, index ):
         self.index = index
 
     def getAction( self, state ):
-        dist = self.getDistribution(state)
+        """
+        Draws from getDistribution.  Ghosts with a transition key prepare the
+        draw from each distribution once and keep it, so a ghost back in the
+        same situation draws with a binary search alone.
+        """
+        key = self.getTransitionKey( state )
+        if key == None: return self.chooseAction( self.getDistribution( state ) )
+        ghostState = state.data.agentStates[self.index] # RandomGhost(0) may play Pacman
+        key = ( key, ghostState.configuration, ghostState.scaredTimer )
+        if state.data.layout is not self.drawLayout or len( self.draws ) >= DRAW_CACHE_SIZE:
+            self.drawLayout = state.data.layout
+            self.draws = {}
+        draw = self.draws.get( key )
+        if draw == None:
+            dist = self.getDistribution( state )
+            if type( dist ) != dict and type( dist ) != util.Counter: return self.chooseAction( dist )
+            weights, actions = sampling.getWeights( dist )
+            draw = self.draws[key] = ( sampling.buildCdf( weights ), actions )
+        cdf, actions = draw
+        if len( actions ) == 0: return Directions.STOP
+        return actions[sampling.searchCdf( cdf, random.random() )]
+
+    def chooseAction( self, dist ):
         if len(dist) == 0:
             return Directions.STOP
         else:
@@ -34,6 +62,16 @@ class GhostAgent( Agent ):
         "Returns a Counter encoding a distribution over actions from the provided state."
         util.raiseNotDefined()
 
+    def getTransitionKey(self, state):
+        """
+        Returns a hashable key that, together with the layout and the ghost's
+        own configuration and scaredTimer, fully determines getDistribution in
+        the provided state, or None if the distribution depends on more than
+        that.  Inference modules cache ghost transition models under this key,
+        and getAction the draws from the distributions.
+        """
+        return None
+
 class RandomGhost( GhostAgent ):
     "A ghost that chooses a legal action uniformly at random."
     def getDistribution( self, state ):
@@ -42,10 +80,16 @@ class RandomGhost( GhostAgent ):
         dist.normalize()
         return dist
 
+    def getTransitionKey( self, state ):
+        return ()
+
 class StaticGhost( GhostAgent ):
     def getDistribution( self, state):
 	return []
 
+    def getTransitionKey( self, state ):
+        return ()
+
 class DirectionalGhost( GhostAgent ):
     "A ghost that prefers to rush Pacman, or flee when scared."
     def __init__( self, index, prob_attack=0.8, prob_scaredFlee=0.8 ):
@@ -87,3 +131,8 @@ class DirectionalGhost( GhostAgent ):
         for a in legalActions: dist[a] += ( 1-bestProb ) / len(legalActions)
         dist.normalize()
         return dist
+
+    def getTransitionKey( self, state ):
+        # Inference places the ghost as a fresh, unscared AgentState, and
+        # Pacman's observations hide the real one, so only Pacman matters
+        return ( self.prob_attack, self.prob_scaredFlee, state.getPacmanPosition() )
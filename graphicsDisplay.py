@@ -13,7 +13,7 @@
 
 
 from graphicsUtils import *
-import math, time
+import math, time, util
 from game import Directions
 
 ###########################
@@ -262,7 +262,6 @@ class PacmanGraphics:
         self.agentImages[agentIndex] = (agentState, prevImage)
 
         if newState._foodEaten != None:
-	    print 'REMOVE'
             self.removeFood(newState._foodEaten, self.food)
         if newState._capsuleEaten != None:
             self.removeCapsule(newState._capsuleEaten, self.capsules)
@@ -604,9 +603,9 @@ class PacmanGraphics:
 
 
     def updateDistributions(self, distributions):
-        "Draws an agent's belief distributions"
-        # copy all distributions so we don't change their state
-        distributions = map(lambda x: x.copy(), distributions)
+        "Draws an agent's belief distributions, util.Counters or util.DenseCounters"
+        # copy the Counters so we don't change their state; reading a DenseCounter adds no keys
+        distributions = [isinstance(x, util.DenseCounter) and x or x.copy() for x in distributions]
         if self.distributionImages == None:
             self.drawDistributions(self.previousState)
         for x in range(len(self.distributionImages)):
@@ -17,6 +17,8 @@ import util
 import random
 import busters
 import game
+import numpy
+from collections import OrderedDict
 
 class InferenceModule:
     """
@@ -48,6 +50,9 @@ class InferenceModule:
         ghostPosition = gameState.getGhostPosition(self.index) # The position you set
         actionDist = self.ghostAgent.getDistribution(gameState)
         dist = util.Counter()
+        if len(actionDist) == 0: # Like GhostAgent.getAction, no distribution means STOP
+            dist[ghostPosition] = 1.0
+            return dist
         for action, prob in actionDist.items():
             successorPosition = game.Actions.getSuccessor(ghostPosition, action)
             dist[successorPosition] = prob
@@ -60,8 +65,9 @@ class InferenceModule:
 
         Note that calling setGhostPosition does not change the position of the
         ghost in the GameState object used for tracking the true progression of
-        the game.  The code in inference.py only ever receives a deep copy of
-        the GameState object which is responsible for maintaining game state,
+        the game.  The code in inference.py only ever receives a copy of the
+        GameState object which is responsible for maintaining game state (see
+        GameState.makeObservation), with a list of agent states of its own,
         not a reference to the original object.  Note also that the ghost
         distance observations are stored at the time the GameState object is
         created, so changing the position of the ghost will not affect the
@@ -83,8 +89,18 @@ class InferenceModule:
         "Initializes beliefs to a uniform distribution over all positions."
         # The legal positions do not include the ghost prison cells in the bottom left.
         self.legalPositions = [p for p in gameState.getWalls().asList(False) if p[1] > 1]
+        self.positionIndex = getPositionIndex(self.legalPositions)
+        walls = gameState.getWalls()
+        busters.getEmissionModel().precompute(walls.width + walls.height)
         self.initializeUniformly(gameState)
 
+    def getTransitionMatrix(self, gameState):
+        """
+        Returns the sparse transition matrix of the tracked ghost from
+        gameState; see the module-level getTransitionMatrix.
+        """
+        return getTransitionMatrix(gameState, self.ghostAgent, self.positionIndex)
+
     ######################################
     # Methods that need to be overridden #
     ######################################
@@ -108,70 +124,230 @@ class InferenceModule:
         """
         pass
 
+    def getBeliefDenseCounter(self):
+        """
+        Returns the belief state as a util.DenseCounter, for callers that
+        sort, sample or combine beliefs without looping in Python.  It is
+        over the legal positions, unless some belief lies elsewhere (in jail).
+        """
+        beliefs = self.getBeliefDistribution()
+        for position in beliefs:
+            if position not in self.positionIndex.index:
+                return util.DenseCounter.fromCounter(beliefs, beliefs.keys())
+        dense = self.positionIndex.asDenseCounter(None)
+        for position, value in beliefs.items():
+            dense[position] = value
+        return dense
+
+class PositionIndex:
+    """
+    Numbers the legal ghost positions of a layout so that beliefs over them can
+    be held in NumPy arrays.  Vectors of Manhattan distances from each position
+    to Pacman are computed once per Pacman cell and shared by every module
+    tracking a ghost on the same board.
+    """
+    def __init__(self, legalPositions):
+        self.positions = list(legalPositions)
+        self.index = dict([(p, i) for i, p in enumerate(self.positions)])
+        self.xs = numpy.array([p[0] for p in self.positions])
+        self.ys = numpy.array([p[1] for p in self.positions])
+        self.distanceTables = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def getDistancesToPacman(self, pacmanPosition):
+        "Returns an int array of the distance from every legal position to Pacman."
+        distances = self.distanceTables.get(pacmanPosition)
+        if distances is None:
+            x, y = pacmanPosition
+            distances = (numpy.abs(self.xs - x) + numpy.abs(self.ys - y)).astype(int)
+            self.distanceTables[pacmanPosition] = distances
+        return distances
+
+    def asDenseCounter(self, values):
+        "Converts a vector over the legal positions into a util.DenseCounter sharing this index."
+        return util.DenseCounter(self.positions, values, self.index)
+
+    def asCounter(self, values):
+        "Converts a vector over the legal positions into a util.Counter of its positive values."
+        dist = util.Counter()
+        for i in numpy.flatnonzero(values > 0).tolist():
+            dist[self.positions[i]] = values.item(i)
+        return dist
+
+def getCertainCounter(position):
+    "Returns the util.Counter of a belief certain of position, such as a jail."
+    dist = util.Counter()
+    dist[position] = 1.0
+    return dist
+
+# Least recently used transition matrices are evicted beyond this many
+TRANSITION_CACHE_SIZE = 1024
+transitionMatrices = OrderedDict()
+
+positionIndexes = {}
+def getPositionIndex(legalPositions):
+    "Returns the shared PositionIndex for a list of legal positions."
+    key = tuple(legalPositions)
+    if key not in positionIndexes:
+        positionIndexes[key] = PositionIndex(legalPositions)
+    return positionIndexes[key]
+
+def getTransitionMatrix(gameState, ghostAgent, positionIndex):
+    """
+    Returns the sparse transition matrix of ghostAgent from gameState, as
+    parallel (sources, targets, probs) arrays of numbers in positionIndex and
+    probabilities, sorted by source.  Moves that leave the legal positions are
+    left out.
+
+    Ghost agents whose getTransitionKey is not None get their matrix from the
+    shared LRU cache, keyed by ghost class, walls and that key; others rebuild
+    it on every call.
+    """
+    getTransitionKey = getattr(ghostAgent, 'getTransitionKey', None)
+    key = None
+    if getTransitionKey != None and not (gameState.isWin() or gameState.isLose()):
+        agentKey = getTransitionKey(gameState)
+        if agentKey != None:
+            key = (ghostAgent.__class__, gameState.getWalls(), agentKey)
+    if key == None:
+        return buildTransitionMatrix(gameState, ghostAgent, positionIndex)
+
+    matrix = transitionMatrices.pop(key, None)
+    if matrix == None:
+        matrix = buildTransitionMatrix(gameState, ghostAgent, positionIndex)
+        if len(transitionMatrices) >= TRANSITION_CACHE_SIZE:
+            transitionMatrices.popitem(last=False)
+    transitionMatrices[key] = matrix
+    return matrix
+
+def buildTransitionMatrix(gameState, ghostAgent, positionIndex):
+    """
+    Builds the matrix returned by getTransitionMatrix, one old position at a
+    time.  The other ghosts stay where they are in gameState.
+    """
+    ghostIndex = ghostAgent.index
+    index = positionIndex.index
+    sources, targets, probs = [], [], []
+    for source, oldPos in enumerate(positionIndex.positions):
+        conf = game.Configuration(oldPos, game.Directions.STOP)
+        gameState.data.agentStates[ghostIndex] = game.AgentState(conf, False)
+        newPosDist = getPositionDistributionForGhost(gameState, ghostIndex - 1, ghostAgent)
+        for newPos, prob in newPosDist.items():
+            if prob > 0 and newPos in index:
+                sources.append(source)
+                targets.append(index[newPos])
+                probs.append(prob)
+    return numpy.array(sources, dtype=int), numpy.array(targets, dtype=int), numpy.array(probs)
+
+def sampleTransitions(matrix, cells, randomState):
+    """
+    Moves every entry of the int array cells, a number in the PositionIndex of
+    the transition matrix, to a successor drawn from its row of the matrix.
+    Cells without any legal successor stay where they are.
+    """
+    sources, targets, probs = matrix
+    if len(targets) == 0:
+        return cells
+    # Lay the rows out side by side, padded to the widest one, so that each
+    # draw is a comparison against a handful of cumulative probabilities.
+    numCells = max(cells.max(), sources.max()) + 1
+    rowLengths = numpy.bincount(sources, minlength=numCells)
+    rowStarts = numpy.cumsum(rowLengths) - rowLengths
+    columns = numpy.arange(len(sources)) - rowStarts[sources]
+    successors = numpy.repeat(numpy.arange(numCells)[:, None], rowLengths.max(), axis=1)
+    successors[sources, columns] = targets
+    cumulative = numpy.zeros(successors.shape)
+    cumulative[sources, columns] = probs
+    cumulative = numpy.cumsum(cumulative, axis=1)
+    totals = cumulative[:, -1:]
+    cumulative = numpy.where(totals > 0, cumulative / numpy.where(totals > 0, totals, 1), 1.0)
+    cumulative[:, -1] = 1.0
+
+    draws = randomState.random_sample(len(cells))
+    picks = (draws[:, None] >= cumulative[cells]).sum(axis=1)
+    return successors[cells, picks].astype(cells.dtype)
+
+def resample(weights, numSamples, randomState, stratified=False):
+    """
+    Returns the indices of numSamples draws from the unnormalized weights.
+
+    Systematic resampling shares a single random offset between evenly spaced
+    points, stratified resampling draws one offset per point; both make one
+    pass over the sorted points instead of sampling each draw separately.
+    """
+    cumulative = numpy.cumsum(weights, dtype=float)
+    cumulative /= cumulative[-1]
+    if stratified:
+        offsets = randomState.random_sample(numSamples)
+    else:
+        offsets = randomState.random_sample()
+    points = (numpy.arange(numSamples) + offsets) / numSamples
+    return numpy.minimum(numpy.searchsorted(cumulative, points, side='right'), len(weights) - 1)
+
+def newRandomState():
+    """
+    Returns a NumPy random generator seeded from the random module, so games
+    seeded through random.seed stay reproducible.
+    """
+    return numpy.random.RandomState(random.getrandbits(32))
+
+def getEmissionVector(noisyDistance, distances):
+    """
+    Returns P( noisyDistance | true distance ) for each entry of the int array
+    distances, read from the dense tables of busters.getEmissionModel().
+    """
+    likelihoods = busters.getEmissionModel().getLikelihoods(noisyDistance, distances.max())
+    return likelihoods[distances]
+
 class ExactInference(InferenceModule):
     """
-    The exact dynamic inference module should use forward-algorithm updates to
+    The exact dynamic inference module uses forward-algorithm updates to
     compute the exact belief function at each time step.
+
+    Beliefs are a NumPy vector over self.legalPositions, numbered by a shared
+    PositionIndex.  Once the tracked ghost is captured, self.jailed is set and
+    all of the belief sits on its prison cell.
     """
 
     def initializeUniformly(self, gameState):
         "Begin with a uniform distribution over ghost positions."
-        self.beliefs = util.Counter()
-        for p in self.legalPositions: self.beliefs[p] = 1.0
-        self.beliefs.normalize()
+        self.beliefs = numpy.ones(len(self.positionIndex)) / len(self.positionIndex)
+        self.jailed = False
 
     def observe(self, observation, gameState):
         """
         Updates beliefs based on the distance observation and Pacman's position.
 
         The noisyDistance is the estimated Manhattan distance to the ghost you
-        are tracking.
-
-        The emissionModel below stores the probability of the noisyDistance for
-        any true distance you supply. That is, it stores P(noisyDistance |
-        TrueDistance).
-
-        self.legalPositions is a list of the possible ghost positions (you
-        should only consider positions that are in self.legalPositions).
-
-        A correct implementation will handle the following special case:
-          *  When a ghost is captured by Pacman, all beliefs should be updated
-             so that the ghost appears in its prison cell, position
-             self.getJailPosition()
-
-             You can check if a ghost has been captured by Pacman by
-             checking if it has a noisyDistance of None (a noisy distance
-             of None will be returned if, and only if, the ghost is
-             captured).
+        are tracking.  The prior is multiplied elementwise by the likelihood of
+        the noisyDistance at each legal position, P(noisyDistance |
+        TrueDistance), read through the distance-to-Pacman vector of the
+        current Pacman cell.
+
+        When a ghost is captured by Pacman its noisyDistance is None, and all
+        beliefs move to its prison cell, self.getJailPosition().  If an
+        observation rules out every position with belief, the beliefs restart
+        from the observation alone.
         """
         noisyDistance = observation
-        emissionModel = busters.getObservationDistribution(noisyDistance)
-        pacmanPosition = gameState.getPacmanPosition()
-       
-        "*** YOUR CODE HERE ***"
-        ##AA
-        '''print("Estamos Aqui")
-        print(pacmanPosition)
-        print(noisyDistance)
-        print(emissionModel)
-        print("Estamos Aqui")
-        ##move = Directions.WEST
-        #AA'''
-        ##util.raiseNotDefined()
-
-        # Replace this code with a correct observation update
-        # Be sure to handle the "jail" edge case where the ghost is eaten
-        # and noisyDistance is None
-        allPossible = util.Counter()
-        for p in self.legalPositions:
-            trueDistance = util.manhattanDistance(p, pacmanPosition)
-            if emissionModel[trueDistance] > 0:
-                allPossible[p] = 1.0
-
-        "*** END YOUR CODE HERE ***"
-
-        allPossible.normalize()
-        self.beliefs = allPossible
+        if noisyDistance == None:
+            self.jailed = True
+            return
+        self.jailed = False
+        distances = self.positionIndex.getDistancesToPacman(gameState.getPacmanPosition())
+        likelihoods = getEmissionVector(noisyDistance, distances)
+
+        beliefs = self.beliefs * likelihoods
+        total = beliefs.sum()
+        if total == 0:
+            beliefs = likelihoods.copy()
+            total = beliefs.sum()
+        if total == 0:
+            self.initializeUniformly(gameState)
+            return
+        self.beliefs = beliefs / total
 
     def elapseTime(self, gameState):
         """
@@ -182,63 +358,39 @@ class ExactInference(InferenceModule):
         Pacman's current position (e.g., for DirectionalGhost).  However, this
         is not a problem, as Pacman's current position is known.
 
-        In order to obtain the distribution over new positions for the ghost,
-        given its previous position (oldPos) as well as Pacman's current
-        position, use this line of code:
+        The distribution over new positions for each old position comes from
 
           newPosDist = self.getPositionDistribution(self.setGhostPosition(gameState, oldPos))
 
-        Note that you may need to replace "oldPos" with the correct name of the
-        variable that you have used to refer to the previous ghost position for
-        which you are computing this distribution. You will need to compute
-        multiple position distributions for a single update.
-
-        newPosDist is a util.Counter object, where for each position p in
-        self.legalPositions,
-
-        newPostDist[p] = Pr( ghost is at position p at time t + 1 | ghost is at position oldPos at time t )
-
-        (and also given Pacman's current position).  You may also find it useful
-        to loop over key, value pairs in newPosDist, like:
-
-          for newPos, prob in newPosDist.items():
-            ...
-
-        *** GORY DETAIL AHEAD ***
-
-        As an implementation detail (with which you need not concern yourself),
-        the line of code at the top of this comment block for obtaining
-        newPosDist makes use of two helper methods provided in InferenceModule
-        above:
-
-          1) self.setGhostPosition(gameState, ghostPosition)
-              This method alters the gameState by placing the ghost we're
-              tracking in a particular position.  This altered gameState can be
-              used to query what the ghost would do in this position.
-
-          2) self.getPositionDistribution(gameState)
-              This method uses the ghost agent to determine what positions the
-              ghost will move to from the provided gameState.  The ghost must be
-              placed in the gameState with a call to self.setGhostPosition
-              above.
-
-        It is worthwhile, however, to understand why these two helper methods
-        are used and how they combine to give us a belief distribution over new
-        positions after a time update from a particular position.
+        and is collected into a sparse transition matrix by getTransitionMatrix,
+        which caches it when the ghost agent allows, so the update itself is a
+        single matrix-vector product.  Probability mass moving outside
+        self.legalPositions is dropped before renormalizing.
         """
-        "*** YOUR CODE HERE ***"
-        ##util.raiseNotDefined()
+        if self.jailed: return
+        sources, targets, probs = self.getTransitionMatrix(gameState)
+        beliefs = numpy.bincount(targets, weights=self.beliefs[sources] * probs,
+                                 minlength=len(self.positionIndex))
+        total = beliefs.sum()
+        if total > 0:
+            self.beliefs = beliefs / total
 
     def getBeliefDistribution(self):
-        return self.beliefs
+        if self.jailed: return getCertainCounter(self.getJailPosition())
+        return self.positionIndex.asCounter(self.beliefs)
+
+    def getBeliefDenseCounter(self):
+        if self.jailed:
+            return util.DenseCounter([self.getJailPosition()], [1.0])
+        return self.positionIndex.asDenseCounter(self.beliefs)
 
 class ParticleFilter(InferenceModule):
     """
     A particle filter for approximately tracking a single ghost.
 
-    Useful helper functions will include random.choice, which chooses an element
-    from a list uniformly at random, and util.sample, which samples a key from a
-    Counter by treating its values as probabilities.
+    Particles are an int32 array of cells numbered by the shared
+    PositionIndex.  Once the tracked ghost is captured, self.jailed is set and
+    every particle stands for its prison cell.
     """
 
     def __init__(self, ghostAgent, numParticles=300):
@@ -251,77 +403,69 @@ class ParticleFilter(InferenceModule):
 
     def initializeUniformly(self, gameState):
         """
-        Initializes a list of particles. Use self.numParticles for the number of
-        particles. Use self.legalPositions for the legal board positions where a
-        particle could be located.  Particles should be evenly (not randomly)
-        distributed across positions in order to ensure a uniform prior.
-
-        Note: the variable you store your particles in must be a list; a list is
-        simply a collection of unweighted variables (positions in this case).
-        Storing your particles as a Counter (where there could be an associated
-        weight with each position) is incorrect and may produce errors.
+        Spreads self.numParticles particles evenly (not randomly) across
+        self.legalPositions in order to ensure a uniform prior.
         """
-        "*** YOUR CODE HERE ***"
+        numPositions = len(self.positionIndex)
+        self.particles = (numpy.arange(self.numParticles) % numPositions).astype(numpy.int32)
+        self.jailed = False
 
     def observe(self, observation, gameState):
         """
-        Update beliefs based on the given distance observation. Make sure to
-        handle the special case where all particles have weight 0 after
-        reweighting based on observation. If this happens, resample particles
-        uniformly at random from the set of legal positions
-        (self.legalPositions).
-
-        A correct implementation will handle two special cases:
-          1) When a ghost is captured by Pacman, all particles should be updated
-             so that the ghost appears in its prison cell,
-             self.getJailPosition()
-
-             As before, you can check if a ghost has been captured by Pacman by
-             checking if it has a noisyDistance of None.
-
-          2) When all particles receive 0 weight, they should be recreated from
-             the prior distribution by calling initializeUniformly. The total
-             weight for a belief distribution can be found by calling totalCount
-             on a Counter object
-
-        util.sample(Counter object) is a helper method to generate a sample from
-        a belief distribution.
-
-        You may also want to use util.manhattanDistance to calculate the
-        distance between a particle and Pacman's position.
+        Update beliefs based on the given distance observation.
+
+        Each particle is weighted by P(noisyDistance | TrueDistance) at its
+        cell, read through the distance-to-Pacman vector of the current Pacman
+        cell, and the particles are then resampled systematically.
+
+        When a ghost is captured by Pacman its noisyDistance is None, and all
+        particles move to its prison cell, self.getJailPosition().  When every
+        particle receives zero weight they are recreated from the uniform prior.
         """
         noisyDistance = observation
-        emissionModel = busters.getObservationDistribution(noisyDistance)
-        pacmanPosition = gameState.getPacmanPosition()
-        "*** YOUR CODE HERE ***"
-        ##util.raiseNotDefined()
+        if noisyDistance == None:
+            self.jailed = True
+            return
+        self.jailed = False
+        distances = self.positionIndex.getDistancesToPacman(gameState.getPacmanPosition())
+        # Particles in the same cell share a weight, so resample whole cells
+        counts = numpy.bincount(self.particles, minlength=len(self.positionIndex))
+        weights = counts * getEmissionVector(noisyDistance, distances)
+        if weights.sum() == 0:
+            self.initializeUniformly(gameState)
+            return
+        cells = resample(weights, self.numParticles, newRandomState())
+        self.particles = cells.astype(numpy.int32)
 
     def elapseTime(self, gameState):
         """
         Update beliefs for a time step elapsing.
 
-        As in the elapseTime method of ExactInference, you should use:
-
-          newPosDist = self.getPositionDistribution(self.setGhostPosition(gameState, oldPos))
-
-        to obtain the distribution over new positions for the ghost, given its
-        previous position (oldPos) as well as Pacman's current position.
-
-        util.sample(Counter object) is a helper method to generate a sample from
-        a belief distribution.
+        Each particle moves to a successor drawn from the tracked ghost's
+        transition matrix, as returned by getTransitionMatrix, all at once.
         """
-        "*** YOUR CODE HERE ***"
-        ##util.raiseNotDefined()
+        if self.jailed: return
+        matrix = self.getTransitionMatrix(gameState)
+        self.particles = sampleTransitions(matrix, self.particles, newRandomState())
 
     def getBeliefDistribution(self):
         """
         Return the agent's current belief state, a distribution over ghost
-        locations conditioned on all evidence and time passage. This method
-        essentially converts a list of particles into a belief distribution (a
-        Counter object)
+        locations conditioned on all evidence and time passage, as the
+        fraction of particles in each cell.
         """
-        "*** YOUR CODE HERE ***"
-       ## util.raiseNotDefined()
+        if self.jailed: return getCertainCounter(self.getJailPosition())
+        return self.positionIndex.asCounter(self.getParticleFractions())
+
+    def getBeliefDenseCounter(self):
+        if self.jailed:
+            return util.DenseCounter([self.getJailPosition()], [1.0])
+        return self.positionIndex.asDenseCounter(self.getParticleFractions())
+
+    def getParticleFractions(self):
+        "Returns the vector of the fraction of particles in each legal position."
+        counts = numpy.bincount(self.particles, minlength=len(self.positionIndex))
+        return counts / float(len(self.particles))
 
 class MarginalInference(InferenceModule):
     """
@@ -347,16 +491,20 @@ class MarginalInference(InferenceModule):
 
     def getBeliefDistribution(self):
         "Returns the marginal belief over a particular ghost by summing out the others."
-        jointDistribution = jointInference.getBeliefDistribution()
-        dist = util.Counter()
-        for t, prob in jointDistribution.items():
-            dist[t[self.index - 1]] += prob
-        return dist
+        return jointInference.getMarginalDistribution(self.index - 1)
+
+    def getBeliefDenseCounter(self):
+        return jointInference.getMarginalDenseCounter(self.index - 1)
 
 class JointParticleFilter:
     """
     JointParticleFilter tracks a joint distribution over tuples of all ghost
     positions.
+
+    Particles are an int32 array with one row per particle and one column per
+    ghost, holding cells numbered by the shared PositionIndex.  Captured
+    ghosts are flagged in the boolean array self.jailed, and their column
+    stands for their prison cell whatever it holds.
     """
 
     def __init__(self, numParticles=600):
@@ -370,30 +518,23 @@ class JointParticleFilter:
         self.numGhosts = gameState.getNumAgents() - 1
         self.ghostAgents = []
         self.legalPositions = legalPositions
+        self.positionIndex = getPositionIndex(legalPositions)
+        self.jailed = numpy.zeros(self.numGhosts, dtype=bool)
         self.initializeParticles()
 
     def initializeParticles(self):
         """
         Initialize particles to be consistent with a uniform prior.
 
-        Each particle is a tuple of ghost positions. Use self.numParticles for
-        the number of particles. You may find the `itertools` package helpful.
-        Specifically, you will need to think about permutations of legal ghost
-        positions, with the additional understanding that ghosts may occupy the
-        same space. Look at the `itertools.product` function to get an
-        implementation of the Cartesian product.
-
-        Note: If you use itertools, keep in mind that permutations are not
-        returned in a random order; you must shuffle the list of permutations in
-        order to ensure even placement of particles across the board. Use
-        self.legalPositions to obtain a list of positions a ghost may occupy.
-
-        Note: the variable you store your particles in must be a list; a list is
-        simply a collection of unweighted variables (positions in this case).
-        Storing your particles as a Counter (where there could be an associated
-        weight with each position) is incorrect and may produce errors.
+        Every ghost's column holds each legal position equally often, and the
+        columns are shuffled independently so that the joint positions are
+        spread evenly across the board.
         """
-        "*** YOUR CODE HERE ***"
+        randomState = newRandomState()
+        column = numpy.arange(self.numParticles) % len(self.positionIndex)
+        self.particles = numpy.empty((self.numParticles, self.numGhosts), dtype=numpy.int32)
+        for i in range(self.numGhosts):
+            self.particles[:, i] = randomState.permutation(column)
 
     def addGhostAgent(self, agent):
         """
@@ -410,105 +551,101 @@ class JointParticleFilter:
         Resamples the set of particles using the likelihood of the noisy
         observations.
 
-        To loop over the ghosts, use:
-
-          for i in range(self.numGhosts):
-            ...
-
-        A correct implementation will handle two special cases:
-          1) When a ghost is captured by Pacman, all particles should be updated
-             so that the ghost appears in its prison cell, position
-             self.getJailPosition(i) where `i` is the index of the ghost.
-
-             As before, you can check if a ghost has been captured by Pacman by
-             checking if it has a noisyDistance of None.
-
-          2) When all particles receive 0 weight, they should be recreated from
-             the prior distribution by calling initializeParticles. After all
-             particles are generated randomly, any ghosts that are eaten (have
-             noisyDistance of None) must be changed to the jail Position. This
-             will involve changing each particle if a ghost has been eaten.
-
-        self.getParticleWithGhostInJail is a helper method to edit a specific
-        particle. Since we store particles as tuples, they must be converted to
-        a list, edited, and then converted back to a tuple. This is a common
-        operation when placing a ghost in jail.
+        The weight of a particle is the product over ghosts still at large of
+        P(noisyDistance | TrueDistance) at that ghost's cell.  A ghost with a
+        noisyDistance of None has been captured and is flagged in self.jailed.
+        When all particles receive 0 weight, they are recreated from the prior
+        distribution by calling initializeParticles.
         """
         pacmanPosition = gameState.getPacmanPosition()
         noisyDistances = gameState.getNoisyGhostDistances()
         if len(noisyDistances) < self.numGhosts:
             return
-        emissionModels = [busters.getObservationDistribution(dist) for dist in noisyDistances]
+        distances = self.positionIndex.getDistancesToPacman(pacmanPosition)
+
+        weights = numpy.ones(self.numParticles)
+        for i in range(self.numGhosts):
+            if noisyDistances[i] == None:
+                self.jailed[i] = True
+                continue
+            weights *= getEmissionVector(noisyDistances[i], distances)[self.particles[:, i]]
+        if weights.sum() == 0:
+            self.initializeParticles()
+            return
+        self.particles = self.particles[resample(weights, self.numParticles, newRandomState())]
 
-        "*** YOUR CODE HERE ***"
-
-    def getParticleWithGhostInJail(self, particle, ghostIndex):
-        """
-        Takes a particle (as a tuple of ghost positions) and returns a particle
-        with the ghostIndex'th ghost in jail.
-        """
-        particle = list(particle)
-        particle[ghostIndex] = self.getJailPosition(ghostIndex)
-        return tuple(particle)
+    def getParticlePositions(self, particle):
+        "Returns a row of self.particles as a tuple of ghost positions."
+        positions = self.positionIndex.positions
+        return tuple([self.getJailPosition(i) if self.jailed[i] else positions[cell]
+                      for i, cell in enumerate(particle)])
 
     def elapseTime(self, gameState):
         """
         Samples each particle's next state based on its current state and the
         gameState.
 
-        To loop over the ghosts, use:
-
-          for i in range(self.numGhosts):
-            ...
-
-        Then, assuming that `i` refers to the index of the ghost, to obtain the
-        distributions over new positions for that single ghost, given the list
-        (prevGhostPositions) of previous positions of ALL of the ghosts, use
-        this line of code:
-
-          newPosDist = getPositionDistributionForGhost(
-             setGhostPositions(gameState, prevGhostPositions), i, self.ghostAgents[i]
-          )
-
-        Note that you may need to replace `prevGhostPositions` with the correct
-        name of the variable that you have used to refer to the list of the
-        previous positions of all of the ghosts, and you may need to replace `i`
-        with the variable you have used to refer to the index of the ghost for
-        which you are computing the new position distribution.
-
-        As an implementation detail (with which you need not concern yourself),
-        the line of code above for obtaining newPosDist makes use of two helper
-        functions defined below in this file:
-
-          1) setGhostPositions(gameState, ghostPositions)
-              This method alters the gameState by placing the ghosts in the
-              supplied positions.
-
-          2) getPositionDistributionForGhost(gameState, ghostIndex, agent)
-              This method uses the supplied ghost agent to determine what
-              positions a ghost (ghostIndex) controlled by a particular agent
-              (ghostAgent) will move to in the supplied gameState.  All ghosts
-              must first be placed in the gameState using setGhostPositions
-              above.
-
-              The ghost agent you are meant to supply is
-              self.ghostAgents[ghostIndex-1], but in this project all ghost
-              agents are always the same.
+        Ghosts whose agents provide a transition key move independently of the
+        others, so their whole column is sampled from the (cached) transition
+        matrix at once.  For other agents, such as DispersingGhost, the
+        distribution over new positions is computed once per distinct
+        particle, with all the ghosts placed by setGhostPositions, and shared
+        by every copy of that particle.  Captured ghosts stay in jail.
         """
-        newParticles = []
-        for oldParticle in self.particles:
-            newParticle = list(oldParticle) # A list of ghost positions
-            # now loop through and update each entry in newParticle...
+        randomState = newRandomState()
+        newParticles = self.particles.copy()
+        dependent = []
+        for i in range(self.numGhosts):
+            if self.jailed[i]: continue
+            agent = self.ghostAgents[i]
+            getTransitionKey = getattr(agent, 'getTransitionKey', None)
+            if getTransitionKey == None or getTransitionKey(gameState) == None:
+                dependent.append(i)
+                continue
+            matrix = getTransitionMatrix(gameState, agent, self.positionIndex)
+            newParticles[:, i] = sampleTransitions(matrix, self.particles[:, i], randomState)
+
+        if len(dependent) > 0:
+            index = self.positionIndex.index
+            groups = {}
+            for row, particle in enumerate(self.particles.tolist()):
+                groups.setdefault(tuple(particle), []).append(row)
+            for particle, rows in groups.items():
+                prevGhostPositions = self.getParticlePositions(particle)
+                for i in dependent:
+                    newPosDist = getPositionDistributionForGhost(
+                        setGhostPositions(gameState, prevGhostPositions), i, self.ghostAgents[i]
+                    )
+                    cells = [index[pos] for pos in newPosDist if pos in index and newPosDist[pos] > 0]
+                    if len(cells) == 0: continue
+                    probs = numpy.array([newPosDist[self.positionIndex.positions[cell]] for cell in cells])
+                    picks = randomState.choice(len(cells), size=len(rows), p=probs / probs.sum())
+                    newParticles[rows, i] = numpy.array(cells)[picks]
+        self.particles = newParticles
 
-            "*** YOUR CODE HERE ***"
+    def getMarginalDistribution(self, i):
+        "Returns the fraction of particles holding each position for ghost i."
+        if self.jailed[i]: return getCertainCounter(self.getJailPosition(i))
+        return self.positionIndex.asCounter(self.getMarginalFractions(i))
 
-            "*** END YOUR CODE HERE ***"
-            newParticles.append(tuple(newParticle))
-        self.particles = newParticles
+    def getMarginalDenseCounter(self, i):
+        "Returns getMarginalDistribution(i) as a util.DenseCounter."
+        if self.jailed[i]:
+            return util.DenseCounter([self.getJailPosition(i)], [1.0])
+        return self.positionIndex.asDenseCounter(self.getMarginalFractions(i))
+
+    def getMarginalFractions(self, i):
+        "Returns the vector of the fraction of particles holding each legal position for ghost i."
+        counts = numpy.bincount(self.particles[:, i], minlength=len(self.positionIndex))
+        return counts / float(self.numParticles)
 
     def getBeliefDistribution(self):
-        "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
+        "Returns the fraction of particles holding each tuple of ghost positions."
+        rows, counts = numpy.unique(self.particles, axis=0, return_counts=True)
+        dist = util.Counter()
+        for particle, count in zip(rows.tolist(), counts.tolist()):
+            dist[self.getParticlePositions(particle)] = count / float(self.numParticles)
+        return dist
 
 # One JointInference module is shared globally across instances of MarginalInference
 jointInference = JointParticleFilter()
@@ -522,6 +659,9 @@ def getPositionDistributionForGhost(gameState, ghostIndex, agent):
     ghostPosition = gameState.getGhostPosition(ghostIndex+1)
     actionDist = agent.getDistribution(gameState)
     dist = util.Counter()
+    if len(actionDist) == 0: # Like GhostAgent.getAction, no distribution means STOP
+        dist[ghostPosition] = 1.0
+        return dist
     for action, prob in actionDist.items():
         successorPosition = game.Actions.getSuccessor(ghostPosition, action)
         dist[successorPosition] = prob
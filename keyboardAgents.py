@@ -14,14 +14,21 @@
 from game import Agent
 from game import Directions
 from game import GameStateData
-from sklearn.preprocessing import OrdinalEncoder
-import pandas as pd
+from datasetWriter import Dataset, NUMERIC
 import random
 
 
 ##Isa
 import sys
 
+DIRECTIONS = [Directions.STOP, Directions.EAST, Directions.WEST, Directions.NORTH, Directions.SOUTH]
+
+# Una fila por movimiento del teclado, en CSV con cabecera
+PACMAN_DATA = Dataset("all_data_pacman.arff",
+    [('LegalMove%d' % i, DIRECTIONS) for i in range(1, 6)] +
+    [('LivingGhost%d' % i, [True, False]) for i in range(1, 5)] +
+    [('GhostDist%d' % i, NUMERIC) for i in range(1, 5)] +
+    [('NearestFoodDistance', NUMERIC), ('Score', NUMERIC), ('Move', DIRECTIONS), ('ScoreChange', NUMERIC)])
 
 class KeyboardAgent(Agent):
    # NOTE: Arrow keys also work.
@@ -36,7 +43,8 @@ class KeyboardAgent(Agent):
         self.lastMove = Directions.STOP
         self.index = index
         self.keys = []
-        self.previousDf = None  # Inicializar el DataFrame anterior como None
+        self.previousScore = None  # Score de la fila anterior
+        self.dataWriter = None  # Se abre con la primera fila
 
     def printLineData(self, gameState, move):
         # Datos relevantes
@@ -59,56 +67,28 @@ class KeyboardAgent(Agent):
 
         nearestFoodDistance = -1 if nearestFoodDistance is None else nearestFoodDistance
 
-        # Definir los datos
-        data = {
-            'GhostDist1': [ghostDistancesPadded[0]],
-            'GhostDist2': [ghostDistancesPadded[1]],
-            'GhostDist3': [ghostDistancesPadded[2]],
-            'GhostDist4': [ghostDistancesPadded[3]],
-            'LegalMove1': [legalMovesPadded[0]],
-            'LegalMove2': [legalMovesPadded[1]],
-            'LegalMove3': [legalMovesPadded[2]],
-            'LegalMove4': [legalMovesPadded[3]],
-            'LegalMove5': [legalMovesPadded[4]],
-            'LivingGhost1': [livingGhostsFiltered[0]],
-            'LivingGhost2': [livingGhostsFiltered[1]],
-            'LivingGhost3': [livingGhostsFiltered[2]],
-            'LivingGhost4': [livingGhostsFiltered[3]],
-            'NearestFoodDistance': [nearestFoodDistance],
-            'Score': [score],
-            'Move': [move]
-        }
-
-        # Crear DataFrame
-        df = pd.DataFrame(data)
-
-        # Si existe un DataFrame anterior, calcular la diferencia de Score y agregarla al nuevo DataFrame
-        if self.previousDf is not None:
-            lastScore = self.previousDf['Score'].iloc[-1]  # Obtener el ultimo Score del DataFrame anterior
-            currentScore = df['Score'].iloc[0]  # Obtener el Score actual
-            scoreChange = currentScore - lastScore  # Calcular la diferencia
+        # Diferencia de Score con la fila anterior (0 en la primera)
+        if self.previousScore is not None:
+            scoreChange = score - self.previousScore
         else:
-            scoreChange = 0  # Si no hay DataFrame anterior, la diferencia es 0
-
-        # Agregar la columna 'ScoreChange' al DataFrame actual
-        df['ScoreChange'] = scoreChange
-
-        # Reordenar las columnas explicitamente
-        column_order = [
-            'LegalMove1', 'LegalMove2', 'LegalMove3', 'LegalMove4', 'LegalMove5',
-            'LivingGhost1', 'LivingGhost2', 'LivingGhost3', 'LivingGhost4',
-            'GhostDist1', 'GhostDist2', 'GhostDist3', 'GhostDist4',
-            'NearestFoodDistance', 'Score', 'Move', 'ScoreChange'
-        ]
-        
-        df = df[column_order]
-        self.previousDf = df
-
-        # Anhadir el DataFrame al archivo CSV, sin escribir los nombres de las columnas si el archivo ya existe
-        with open("all_data_pacman.arff", "a") as f:
-            df.to_csv(f, header=f.tell()==0, index=False)
-
-        return df
+            scoreChange = 0
+        self.previousScore = score
+
+        # Fila en el orden de las columnas de PACMAN_DATA
+        row = tuple(legalMovesPadded[:5]) + tuple(livingGhostsFiltered[:4]) + tuple(ghostDistancesPadded[:4]) + \
+              (nearestFoodDistance, score, move, scoreChange)
+
+        # Anhadir la fila al buffer; se escribe en all_data_pacman.arff por lotes
+        if self.dataWriter is None:
+            self.dataWriter = PACMAN_DATA.openWriter()
+        self.dataWriter.write(row)
+        return row
+
+    def final(self, state):
+        "Writes out the rows still buffered at the end of the game."
+        if self.dataWriter is not None:
+            self.dataWriter.close()
+            self.dataWriter = None
 
     def getAction( self, state):
         from graphicsUtils import keys_waiting
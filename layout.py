@@ -13,15 +13,19 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Grid, Actions, Configuration, Directions
 import os
 import random
 
 VISIBILITY_MATRIX_CACHE = {}
+LAYOUT_CACHE = {}
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are not modified once built, so copies of a layout and loads of
+    the same layout text share a single object.
     """
 
     def __init__(self, layoutText):
@@ -35,6 +39,7 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        self.initializeMoveTables()
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
@@ -46,7 +51,8 @@ class Layout:
             from game import Directions
             vecs = [(-0.5,0), (0.5,0),(0,-0.5),(0,0.5)]
             dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH:set(), Directions.SOUTH:set(), Directions.EAST:set(), Directions.WEST:set(), Directions.STOP:set()})
+            # Grids only hold booleans, so the columns are lists of a dictionary per cell
+            vis = [[dict([(d, set()) for d in dirs + [Directions.STOP]]) for y in range(self.height)] for x in range(self.width)]
             for x in range(self.width):
                 for y in range(self.height):
                     if self.walls[x][y] == False:
@@ -61,6 +67,39 @@ class Layout:
         else:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
 
+    def initializeMoveTables(self):
+        """
+        Tabulates, for every open cell, the legal directions (in the order
+        Actions.getPossibleActions gives them) and the legal neighbors.
+        """
+        self.legalActions = {}
+        self.legalNeighbors = {}
+        for x, y in self.walls.asList(False):
+            try:
+                actions = Actions.getPossibleActions(Configuration((x, y), Directions.STOP), self.walls)
+            except IndexError:
+                continue # An open cell on the border; leave it to Actions
+            self.legalActions[(x, y)] = tuple(actions)
+            self.legalNeighbors[(x, y)] = tuple(Actions.getLegalNeighbors((x, y), self.walls))
+
+    def getLegalActions(self, config):
+        """
+        Returns the list of directions a configuration may move in, like
+        Actions.getPossibleActions on this layout's walls.  Agents between
+        grid points, such as scared ghosts, fall back on Actions.
+        """
+        actions = self.legalActions.get(config.pos)
+        if actions == None:
+            return Actions.getPossibleActions(config, self.walls)
+        return list(actions)
+
+    def getLegalNeighbors(self, position):
+        "Returns the open cells next to position, like Actions.getLegalNeighbors."
+        neighbors = self.legalNeighbors.get(position)
+        if neighbors == None:
+            return Actions.getLegalNeighbors(position, self.walls)
+        return list(neighbors)
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -90,7 +129,8 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        "Layouts are immutable, so a copy is the layout itself."
+        return self
 
     def processLayoutText(self, layoutText):
         """
@@ -145,5 +185,12 @@ def getLayout(name, back = 2):
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
     f = open(fullname)
-    try: return Layout([line.strip() for line in f])
+    try: return internLayout([line.strip() for line in f])
     finally: f.close()
+
+def internLayout(layoutText):
+    "Returns the shared Layout for a list of layout lines, parsing it only once."
+    key = tuple(layoutText)
+    if key not in LAYOUT_CACHE:
+        LAYOUT_CACHE[key] = Layout(layoutText)
+    return LAYOUT_CACHE[key]
@@ -0,0 +1,355 @@
+# recording.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Recordings of pacman.py and busters.py games in a compact binary format.
+
+A GameRecorder given to a Game (see Game.recorder) collects the actions of
+every move, packed two to a byte, and a keyframe of the full state every
+KEYFRAME_INTERVAL moves: score, food bitset, capsules, agent positions,
+directions and scared timers and, in busters, the living ghosts and the
+move count.  A recording file holds any number of games:
+
+  writer = RecordingWriter('games.rec')
+  writer.write(recorder.getRecord(game))
+  writer.close()
+
+  reader = RecordingReader('games.rec')
+  record = reader.getRecord(3)
+  state = record.getState(250)
+
+getState rebuilds the state at any tick from the keyframe before it and at
+most KEYFRAME_INTERVAL - 1 moves, without replaying the rest of the game.
+
+Games are framed by their length and identify their layout by a
+fingerprint of its text.  The text itself is only stored with the first
+game of each layout in a file, so a file of many games on one board costs a
+few hundred bytes per game.
+"""
+
+import os, struct, zlib, hashlib
+from game import Directions, Configuration, Grid
+import layout
+
+MAGIC = 'PACREC1\n'
+KEYFRAME_INTERVAL = 100 # Moves between two keyframes
+KINDS = ['pacman', 'busters']
+ACTION_CODES = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+
+FRAME = struct.Struct('<I8sH')       # Record length, layout fingerprint, stored layout text length
+HEADER = struct.Struct('<BBHIdBBi')  # Kind, agents, keyframe interval, actions, score, score is float, win, max moves
+AGENT = struct.Struct('<HHBH')       # Doubled x and y, direction and flags, scared timer
+SHORT = struct.Struct('<H')
+LONG = struct.Struct('<I')
+SCORE = struct.Struct('<dB')
+
+FLOAT_POSITION = 8 # Flag for agents whose coordinates are floats
+HAS_BUSTERS_STATE = 1 # Flag for keyframes with living ghosts and a move count
+
+def getLayoutFingerprint(layout):
+    "Returns 8 bytes identifying the text of a layout."
+    return hashlib.sha1('\n'.join(layout.layoutText)).digest()[:8]
+
+def encodeGrid(grid):
+    numBytes = (grid.width * grid.height + 7) / 8
+    hexBits = '%x' % grid.bits
+    if len(hexBits) % 2: hexBits = '0' + hexBits
+    return hexBits.decode('hex').rjust(numBytes, '\0')
+
+def decodeGrid(data, width, height):
+    grid = Grid(width, height)
+    grid.bits = int(data.encode('hex') or '0', 16)
+    return grid
+
+def encodeNumber(value):
+    "Returns a number as a (float, isFloat) pair, so that ints come back as ints."
+    return float(value), isinstance(value, float)
+
+def decodeNumber(value, isFloat):
+    if isFloat: return value
+    return int(value)
+
+def encodeKeyframe(state):
+    "Packs everything about a state that its moves change."
+    data = state.data
+    parts = [SCORE.pack(*encodeNumber(data.score)), encodeGrid(data.food), chr(len(data.capsules))]
+    for x, y in data.capsules:
+        parts.append(chr(x) + chr(y))
+    for agentState in data.agentStates:
+        x, y = agentState.configuration.pos
+        if x * 2 != int(x * 2) or y * 2 != int(y * 2):
+            raise Exception('Cannot record the position %s' % str((x, y)))
+        flags = ACTION_CODES.index(agentState.configuration.direction)
+        if isinstance(x, float) or isinstance(y, float): flags |= FLOAT_POSITION
+        parts.append(AGENT.pack(int(x * 2), int(y * 2), flags, agentState.scaredTimer))
+    livingGhosts = getattr(state, 'livingGhosts', None)
+    if livingGhosts == None:
+        parts.append(chr(0))
+    else:
+        living = sum([1 << i for i, alive in enumerate(livingGhosts) if alive])
+        parts.append(chr(HAS_BUSTERS_STATE) + LONG.pack(living) + LONG.pack(state.numMoves))
+    return ''.join(parts)
+
+def packActions(codes):
+    "Packs a list of action codes two to a byte."
+    if len(codes) % 2: codes = codes + [0]
+    return ''.join([chr(codes[i] | (codes[i + 1] << 4)) for i in range(0, len(codes), 2)])
+
+def unpackActions(data, numActions):
+    codes = []
+    for byte in data:
+        byte = ord(byte)
+        codes.append(byte & 15)
+        codes.append(byte >> 4)
+    return codes[:numActions]
+
+class GameRecord:
+    """
+    The recording of one game: its kind (one of KINDS), layout, number of
+    agents, list of actions, keyframes and outcome.
+
+    Agents move in turn from agent 0, so the agent making action t is
+    t % numAgents, and the state at tick t is the one after t actions.
+    """
+
+    def __init__(self, kind, layout, numAgents, actions, keyframes, score=0, win=False,
+                 maxMoves=-1, keyframeInterval=KEYFRAME_INTERVAL):
+        if kind not in KINDS: raise Exception('Unknown kind of game: ' + str(kind))
+        self.kind = kind
+        self.layout = layout
+        self.numAgents = numAgents
+        self.actions = actions     # List of indices into ACTION_CODES
+        self.keyframes = keyframes # Encoded states at ticks keyframeInterval, 2 * keyframeInterval, ...
+        self.score = score
+        self.win = win
+        self.maxMoves = maxMoves
+        self.keyframeInterval = keyframeInterval
+
+    def __len__(self):
+        "The number of ticks of the game."
+        return len(self.actions)
+
+    def getActions(self):
+        "Returns the list of (agentIndex, action) moves of the game, like Game.moveHistory."
+        return [(t % self.numAgents, ACTION_CODES[code]) for t, code in enumerate(self.actions)]
+
+    def getInitialState(self):
+        if self.kind == 'pacman':
+            import pacman
+            state = pacman.GameState()
+            state.initialize(self.layout, self.numAgents - 1)
+        else:
+            import busters, sonar
+            state = busters.GameState()
+            exactSonar = sonar.Sonar(busters.SONAR_NOISE_VALUES, busters.SONAR_NOISE_PROBS, 'exact')
+            state.initialize(self.layout, self.numAgents - 1, exactSonar)
+            state.maxMoves = self.maxMoves
+        return state
+
+    def decodeKeyframe(self, keyframe):
+        "Returns the state a keyframe was taken of."
+        state = self.getInitialState()
+        data = state.data
+        score, isFloat = SCORE.unpack_from(keyframe, 0)
+        data.score = decodeNumber(score, isFloat)
+        offset = SCORE.size
+        walls = self.layout.walls
+        numBytes = (walls.width * walls.height + 7) / 8
+        data.food = decodeGrid(keyframe[offset:offset + numBytes], walls.width, walls.height)
+        data.numFood = data.food.count()
+        data._foodIndex = None
+        offset += numBytes
+        numCapsules = ord(keyframe[offset])
+        data.capsules = [(ord(keyframe[offset + 1 + 2 * i]), ord(keyframe[offset + 2 + 2 * i])) for i in range(numCapsules)]
+        offset += 1 + 2 * numCapsules
+        for i in range(self.numAgents):
+            x2, y2, flags, scaredTimer = AGENT.unpack_from(keyframe, offset)
+            offset += AGENT.size
+            if flags & FLOAT_POSITION: pos = (x2 / 2.0, y2 / 2.0)
+            else: pos = (x2 / 2, y2 / 2)
+            agentState = data.getAgentStateForUpdate(i)
+            agentState.configuration = Configuration(pos, ACTION_CODES[flags & 7])
+            agentState.scaredTimer = scaredTimer
+        if ord(keyframe[offset]) & HAS_BUSTERS_STATE:
+            living, = LONG.unpack_from(keyframe, offset + 1)
+            state.numMoves, = LONG.unpack_from(keyframe, offset + 1 + LONG.size)
+            state.livingGhosts = [living & (1 << i) != 0 for i in range(self.numAgents)]
+            state.ghostPositions = [state.getGhostPosition(i) for i in range(1, self.numAgents)]
+            data.ghostDistances = state.sonar.readDistances(state.getPacmanPosition(), state.ghostPositions)
+        return state
+
+    def getState(self, tick):
+        """
+        Returns the state after tick actions, rebuilt from the last keyframe
+        before it.
+        """
+        if not 0 <= tick <= len(self.actions):
+            raise IndexError('Tick %d is outside the %d ticks of the game' % (tick, len(self.actions)))
+        keyframe = min(tick / self.keyframeInterval, len(self.keyframes))
+        if keyframe == 0: state = self.getInitialState()
+        else: state = self.decodeKeyframe(self.keyframes[keyframe - 1])
+        for t in range(keyframe * self.keyframeInterval, tick):
+            state = state.generateSuccessor(t % self.numAgents, ACTION_CODES[self.actions[t]])
+        return state
+
+    def iterStates(self, start=0):
+        "Yields the states from tick start to the end of the game, in order."
+        state = self.getState(start)
+        yield state
+        for t in range(start, len(self.actions)):
+            state = state.generateSuccessor(t % self.numAgents, ACTION_CODES[self.actions[t]])
+            yield state
+
+    def encodePayload(self):
+        "Returns the compressed description of the game, apart from its layout."
+        score, isFloat = encodeNumber(self.score)
+        parts = [HEADER.pack(KINDS.index(self.kind), self.numAgents, self.keyframeInterval, len(self.actions),
+                             score, isFloat, self.win, self.maxMoves),
+                 packActions(self.actions), SHORT.pack(len(self.keyframes))]
+        for keyframe in self.keyframes:
+            parts.append(SHORT.pack(len(keyframe)) + keyframe)
+        return zlib.compress(''.join(parts), 9)
+
+    def decodePayload(payload, layout):
+        "Returns the GameRecord of a payload from encodePayload."
+        data = zlib.decompress(payload)
+        kind, numAgents, interval, numActions, score, isFloat, win, maxMoves = HEADER.unpack_from(data, 0)
+        offset = HEADER.size
+        numBytes = (numActions + 1) / 2
+        actions = unpackActions(data[offset:offset + numBytes], numActions)
+        offset += numBytes
+        numKeyframes, = SHORT.unpack_from(data, offset)
+        offset += SHORT.size
+        keyframes = []
+        for i in range(numKeyframes):
+            length, = SHORT.unpack_from(data, offset)
+            keyframes.append(data[offset + SHORT.size:offset + SHORT.size + length])
+            offset += SHORT.size + length
+        return GameRecord(KINDS[kind], layout, numAgents, actions, keyframes,
+                          decodeNumber(score, isFloat), win == 1, maxMoves, interval)
+    decodePayload = staticmethod(decodePayload)
+
+class GameRecorder:
+    """
+    Collects the record of a game as it is played.  Set it as the recorder of
+    a Game before running it; kind is one of KINDS.
+    """
+
+    def __init__(self, kind, layout, keyframeInterval=KEYFRAME_INTERVAL):
+        if kind not in KINDS: raise Exception('Unknown kind of game: ' + str(kind))
+        self.kind = kind
+        self.layout = layout
+        self.keyframeInterval = keyframeInterval
+        self.actions = []
+        self.keyframes = []
+
+    def addMove(self, agentIndex, action, state):
+        "Called by Game after every move with the state it led to."
+        if agentIndex != len(self.actions) % state.getNumAgents():
+            raise Exception('Only games whose agents move in turn from agent 0 can be recorded')
+        self.actions.append(ACTION_CODES.index(action))
+        if len(self.actions) % self.keyframeInterval == 0:
+            self.keyframes.append(encodeKeyframe(state))
+
+    def getRecord(self, game):
+        "Returns the GameRecord of the game, once it is over."
+        state = game.state
+        return GameRecord(self.kind, self.layout, state.getNumAgents(), self.actions, self.keyframes,
+                          state.getScore(), state.isWin(), getattr(state, 'maxMoves', -1), self.keyframeInterval)
+
+class RecordingWriter:
+    "Appends GameRecords to a recording file, creating it if needed."
+
+    def __init__(self, path):
+        self.path = path
+        self.storedLayouts = set()
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.storedLayouts = set(RecordingReader(path).layouts.keys())
+            self.file = open(path, 'ab')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC)
+
+    def write(self, record):
+        self.writeEncoded(getLayoutFingerprint(record.layout), record.layout, record.encodePayload())
+
+    def writeEncoded(self, fingerprint, layout, payload):
+        "Appends a payload from GameRecord.encodePayload, played on layout."
+        layoutText = ''
+        if fingerprint not in self.storedLayouts:
+            layoutText = zlib.compress('\n'.join(layout.layoutText), 9)
+            self.storedLayouts.add(fingerprint)
+        self.file.write(FRAME.pack(len(layoutText) + len(payload), fingerprint, len(layoutText)))
+        self.file.write(layoutText)
+        self.file.write(payload)
+
+    def close(self):
+        self.file.close()
+
+class RecordingReader:
+    """
+    The games of a recording file.  Opening it only reads the frames of the
+    games; each game is decoded when it is asked for.
+    """
+
+    def __init__(self, path):
+        f = open(path, 'rb')
+        try: self.data = f.read()
+        finally: f.close()
+        if not self.data.startswith(MAGIC):
+            raise Exception('Not a game recording: ' + path)
+        self.frames = []  # (fingerprint, payload offset, payload length) of each game
+        self.layouts = {} # Fingerprint -> Layout
+        offset = len(MAGIC)
+        while offset < len(self.data):
+            length, fingerprint, layoutLength = FRAME.unpack_from(self.data, offset)
+            offset += FRAME.size
+            if layoutLength > 0 and fingerprint not in self.layouts:
+                layoutText = zlib.decompress(self.data[offset:offset + layoutLength])
+                self.layouts[fingerprint] = layout.internLayout(layoutText.split('\n'))
+            self.frames.append((fingerprint, offset + layoutLength, length - layoutLength))
+            offset += length
+
+    def __len__(self):
+        return len(self.frames)
+
+    def getRecord(self, i):
+        fingerprint, offset, length = self.frames[i]
+        if fingerprint not in self.layouts:
+            raise Exception('The layout of game %d is missing from the recording' % i)
+        return GameRecord.decodePayload(self.data[offset:offset + length], self.layouts[fingerprint])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.getRecord(i)
+
+def isRecording(path):
+    "Returns whether path is a recording file, as opposed to an older pickled game."
+    f = open(path, 'rb')
+    try: return f.read(len(MAGIC)) == MAGIC
+    finally: f.close()
+
+def getRecordingName(prefix):
+    "Returns a new file name for the recordings of a run, named by the time it started."
+    import time
+    return prefix + '-'.join([str(t) for t in time.localtime()[1:6]]) + '.rec'
+
+def replayRecording(path, display, gameIndex=0, start=0):
+    "Shows game gameIndex of a recording file on display, from tick start on."
+    record = RecordingReader(path).getRecord(gameIndex)
+    states = record.iterStates(start)
+    display.initialize(states.next().data)
+    for state in states:
+        display.update(state.data)
+    display.finish()
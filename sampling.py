@@ -0,0 +1,91 @@
+# sampling.py
+# -----------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Drawing values from discrete distributions.
+
+A distribution is either a list of probabilities (or weights) with the
+matching list of values, or a dictionary such as a util.Counter from values
+to probabilities, whose items are taken in sorted order.
+
+sample binary searches a cumulative distribution, built in one pass over the
+weights, and nSample merges many sorted draws with it; both draw exactly what
+the linear scans of util used to for the same random numbers.  Nothing is
+cached here, as a lookup keyed on the weights would cost the pass it saves.
+Callers that draw from one distribution again and again prepare it once
+with getWeights and buildCdf and keep it, as ghost agents do (see
+GhostAgent.getAction); sonar noise and particle resampling draw through
+NumPy (see sonar.py and inference.py).
+
+Every draw comes from the random module, so seeding it (as --fixRandomSeed
+does) makes the draws reproducible.
+"""
+
+import random
+from bisect import bisect_left
+
+def getWeights(distribution, values=None):
+    "Returns the (weights, values) lists of a distribution; see the module docstring."
+    if hasattr(distribution, 'items'):
+        if len(distribution) == 0: return (), ()
+        values, weights = zip(*sorted(distribution.items()))
+        return weights, values
+    return distribution, values
+
+def buildCdf(weights):
+    """
+    Returns the cumulative distribution of weights, normalized first unless
+    they sum to 1 already.
+    """
+    total = sum(weights)
+    if total != 1 and total != 0:
+        total = float(total)
+        weights = [w / total for w in weights]
+    cdf = []
+    running = 0
+    for w in weights:
+        running += w
+        cdf.append(running)
+    return cdf
+
+def searchCdf(cdf, choice):
+    """
+    Returns the index of the first entry of cdf that is at least choice.
+    Choices beyond the last entry, which rounding errors allow, pick the last
+    value.
+    """
+    return min(bisect_left(cdf, choice), len(cdf) - 1)
+
+def sample(distribution, values=None):
+    "Returns one value drawn from the distribution."
+    weights, values = getWeights(distribution, values)
+    return values[searchCdf(buildCdf(weights), random.random())]
+
+def nSample(distribution, values, n):
+    """
+    Returns a list of n values drawn from the distribution in one pass, in
+    the order of the random numbers they came from (as util.nSample does).
+    The sorted random numbers are merged with the cumulative distribution,
+    in O(n + number of values).
+    """
+    weights, values = getWeights(distribution, values)
+    cdf = buildCdf(weights)
+    draws = [random.random() for i in range(n)]
+    draws.sort()
+    samples = []
+    i, last = 0, len(cdf) - 1
+    for r in draws:
+        while i < last and r >= cdf[i]: i += 1
+        samples.append(values[i])
+    return samples
@@ -0,0 +1,181 @@
+# sonar.py
+# --------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+The emission model of the busters sonar: how likely each noisy distance
+reading is given the true distance to a ghost.
+
+An EmissionModel tabulates P( noisyDistance | trueDistance ) densely, one
+NumPy row per noisy distance, so inference code reads a whole likelihood
+vector at once and single lookups never modify shared state.
+
+A Sonar produces the readings themselves, in one of SONAR_MODES: 'exact'
+reports true distances, 'noisy' adds errors drawn from the default
+geometric noise kernel and 'custom' from a kernel given by the user.
+Sonars draw their errors from a random stream of their own in blocks of
+ERROR_BLOCK, so reading all the ghosts of a tick costs a few list operations.
+Forks of a sonar (see Sonar.fork) read with streams of their own, so that
+agents looking ahead do not shift the noise of the game.
+"""
+
+import util
+import numpy
+import random, copy
+
+SONAR_MODES = ['exact', 'noisy', 'custom']
+ERROR_BLOCK = 1024 # Sonar errors drawn from the random stream at a time
+
+def getGeometricNoise(noiseRange):
+    """
+    Returns the (values, probs) of the default sonar error: an odd number
+    noiseRange of errors centred on 0, each half as likely as the next one
+    closer to 0.
+    """
+    if noiseRange < 1 or noiseRange % 2 == 0:
+        raise Exception('The sonar noise range must be odd, not %s' % noiseRange)
+    maxError = (noiseRange - 1) / 2
+    values = [i - maxError for i in range(noiseRange)]
+    denominator = 2 ** maxError + 2 ** (maxError + 1) - 2.0
+    probs = [2 ** (maxError - abs(v)) / denominator for v in values]
+    return values, probs
+
+class EmissionModel:
+    """
+    The likelihood of noisy sonar readings, for sonar errors noiseValues
+    occurring with probabilities noiseProbs.
+
+    A reading of noisyDistance is explained by each true distance
+    max(1, noisyDistance - error); the table below sums the probabilities of
+    the errors that explain it.
+    """
+
+    def __init__(self, noiseValues, noiseProbs):
+        if len(noiseValues) != len(noiseProbs):
+            raise Exception('Every sonar error needs a probability')
+        self.noiseValues = list(noiseValues)
+        self.noiseProbs = list(noiseProbs)
+        self.maxError = max([abs(v) for v in self.noiseValues])
+        self.table = numpy.zeros((0, 0))
+
+    def precompute(self, maxDistance):
+        """
+        Makes sure the table covers noisy and true distances up to
+        maxDistance, such as the width plus the height of a layout.  The table
+        is rebuilt at least twice as large whenever it is too small.
+        """
+        if maxDistance < len(self.table): return
+        numRows = max(maxDistance + 1, 2 * len(self.table), 16)
+        noisyDistances = numpy.arange(numRows)
+        table = numpy.zeros((numRows, numRows + self.maxError + 1))
+        for error, prob in zip(self.noiseValues, self.noiseProbs):
+            trueDistances = numpy.maximum(1, noisyDistances - error)
+            table[noisyDistances, trueDistances] += prob
+        table.flags.writeable = False
+        self.table = table
+
+    def getLikelihoods(self, noisyDistance, maxDistance=0):
+        """
+        Returns the read-only vector of P( noisyDistance | trueDistance ) over
+        true distances 0, 1, ... at least up to maxDistance.  Readings of None
+        (captured ghosts) have no likelihood anywhere.
+        """
+        if noisyDistance == None:
+            self.precompute(maxDistance)
+            return numpy.zeros(self.table.shape[1])
+        self.precompute(max(noisyDistance, maxDistance))
+        return self.table[noisyDistance]
+
+    def getLikelihood(self, noisyDistance, trueDistance):
+        "Returns P( noisyDistance | trueDistance )."
+        if noisyDistance == None or trueDistance < 0: return 0.0
+        self.precompute(max(noisyDistance, trueDistance))
+        return self.table[noisyDistance, trueDistance]
+
+    def getDistribution(self, noisyDistance):
+        "Returns the likelihoods of noisyDistance as a new util.Counter over the true distances that explain it."
+        distribution = util.Counter()
+        if noisyDistance == None: return distribution
+        likelihoods = self.getLikelihoods(noisyDistance).tolist()
+        for trueDistance, likelihood in enumerate(likelihoods):
+            if likelihood > 0: distribution[trueDistance] = likelihood
+        return distribution
+
+class Sonar:
+    """
+    The sensor of one game, reading the distances from Pacman to every ghost.
+
+    In 'noisy' and 'custom' modes each reading is the true distance plus an
+    error from noiseValues, drawn with probabilities noiseProbs, and never
+    less than 0.  The errors come from a NumPy stream of the sonar's own,
+    seeded with seed or, by default, from the random module, so a game
+    seeded through random reads the same noise whichever process plays it.
+    Exact sonars draw nothing from either.
+    """
+
+    def __init__(self, noiseValues, noiseProbs, mode='exact', seed=None):
+        if mode not in SONAR_MODES:
+            raise Exception('Unknown sonar mode: ' + str(mode))
+        if len(noiseValues) != len(noiseProbs):
+            raise Exception('Every sonar error needs a probability')
+        self.mode = mode
+        self.noiseValues = numpy.array(noiseValues, dtype=int)
+        cdf = numpy.cumsum(noiseProbs, dtype=float)
+        self.cdf = cdf / cdf[-1]
+        self.seed = None
+        self.rng = None # Made on the first draw
+        self.errors = []
+        self.numForks = 0
+        if mode != 'exact':
+            if seed == None: seed = random.getrandbits(32)
+            self.seed = seed
+
+    def fork(self):
+        """
+        Returns a sonar reading like this one from a stream of its own, for
+        the states agents observe: the successors they generate read through
+        the fork, and leave the stream of the game where it is.  The seed of
+        the nth fork is derived from this sonar's, without drawing from any
+        stream, so seeded games still read the same noise.  Exact sonars are
+        their own forks.
+        """
+        if self.mode == 'exact': return self
+        self.numForks += 1
+        child = copy.copy(self)
+        if isinstance(self.seed, list): child.seed = self.seed + [self.numForks]
+        else: child.seed = [self.seed, self.numForks]
+        child.rng = None
+        child.errors = []
+        child.numForks = 0
+        return child
+
+    def sampleErrors(self, n):
+        "Returns a list of n independent sonar errors."
+        if len(self.errors) < n:
+            if self.rng is None: self.rng = numpy.random.RandomState(self.seed)
+            indices = numpy.searchsorted(self.cdf, self.rng.random_sample(max(n, ERROR_BLOCK)), side='right')
+            self.errors = self.errors + self.noiseValues[numpy.minimum(indices, len(self.cdf) - 1)].tolist()
+        errors = self.errors[:n]
+        del self.errors[:n]
+        return errors
+
+    def readDistances(self, pacmanPosition, ghostPositions):
+        """
+        Returns the list of readings of the ghosts at ghostPositions.  Ghosts
+        in jail (on row 1) read None; they still draw an error, so the noise
+        of each ghost does not depend on which others are captured.
+        """
+        distances = [None if g[1] == 1 else util.manhattanDistance(pacmanPosition, g) for g in ghostPositions]
+        if self.mode == 'exact' or len(distances) == 0: return distances
+        errors = self.sampleErrors(len(distances))
+        return [None if d == None else max(0, d + e) for d, e in zip(distances, errors)]
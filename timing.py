@@ -0,0 +1,261 @@
+# timing.py
+# ---------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Timing of agent moves.
+
+perfCounter is the most precise wall clock available.  A MoveTimer times the
+calls a game makes to its agents, keeps a Histogram of the move times of
+every agent and enforces time limits:
+
+  timer = MoveTimer(numAgents)
+  timer.start()
+  action = timer.call(timeout, agent.getAction, state)
+  timer.histograms[agentIndex].add(timer.lastTime)
+  timer.stop()
+
+start installs a SIGALRM handler for the whole game, and each call arms a
+wall clock timer for its deadline, so an agent is interrupted even while it
+sleeps or blocks; nothing else the game does, like the sleeps of displays,
+runs under the timer.  Where signals cannot be used (in threads other than
+the main one, or on platforms without setitimer) a call that runs too long
+is only detected when it returns.
+
+A GameProfiler is the opt-in, finer grained counterpart: given to a Game, it
+measures every call of each of PROFILED_PHASES for every agent, and exports
+latency percentiles and allocation counts as JSON or as Prometheus text.
+"""
+
+import sys, time, signal, bisect, gc, json
+from util import TimeoutFunctionException
+
+if hasattr(time, 'perf_counter'):
+    perfCounter = time.perf_counter
+elif sys.platform == 'win32':
+    perfCounter = time.clock
+else:
+    perfCounter = time.time
+
+# Upper bounds, in seconds, of the buckets of a Histogram; the last bucket is unbounded
+HISTOGRAM_BOUNDS = [0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+                    0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0]
+
+class Histogram:
+    """
+    Counts of values, such as move times in seconds, in the buckets bounded
+    above by bounds, together with their number, sum and maximum.
+    """
+
+    def __init__(self, bounds=HISTOGRAM_BOUNDS):
+        self.bounds = list(bounds)
+        self.counts = [0 for i in range(len(self.bounds) + 1)]
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum: self.maximum = value
+
+    def getMean(self):
+        if self.count == 0: return 0.0
+        return self.total / self.count
+
+    def getPercentile(self, percent):
+        """
+        Returns an estimate of the given percentile (0 to 100) of the values,
+        interpolating linearly within their bucket.
+        """
+        if self.count == 0: return 0.0
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n > 0 and seen + n >= rank:
+                upper = self.maximum
+                if i < len(self.bounds): upper = min(self.bounds[i], upper)
+                lower = 0.0
+                if i > 0: lower = min(self.bounds[i - 1], upper)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.maximum
+
+    def __str__(self):
+        return '%d moves, mean %.2fms, max %.2fms' % (self.count, 1000 * self.getMean(), 1000 * self.maximum)
+
+class MoveTimer:
+    """
+    Times and limits the calls of one game to its numAgents agents, and
+    keeps the histograms of their move times.
+    """
+
+    def __init__(self, numAgents):
+        self.histograms = [Histogram() for i in range(numAgents)]
+        self.lastTime = 0.0
+        self.deadline = None
+        self.usingSignals = False
+        self.oldHandler = None
+        self.oldTimer = None
+
+    def start(self):
+        """
+        Installs the handler of SIGALRM, if signals are available here.  The
+        timer itself is only armed during calls.
+        """
+        if self.usingSignals or not hasattr(signal, 'setitimer'): return
+        try:
+            self.oldHandler = signal.signal(signal.SIGALRM, self.handleTimer)
+        except ValueError: # Not in the main thread
+            return
+        self.oldTimer = signal.setitimer(signal.ITIMER_REAL, 0)
+        self.usingSignals = True
+
+    def stop(self):
+        "Restores the handler and timer that were there before start."
+        if not self.usingSignals: return
+        signal.setitimer(signal.ITIMER_REAL, *self.oldTimer)
+        signal.signal(signal.SIGALRM, self.oldHandler)
+        self.usingSignals = False
+
+    def armTimer(self):
+        "Arms the timer to go off at the deadline."
+        remaining = self.deadline - perfCounter()
+        if remaining <= 0: raise TimeoutFunctionException()
+        signal.setitimer(signal.ITIMER_REAL, remaining)
+
+    def handleTimer(self, signum, frame):
+        if self.deadline == None: return
+        if perfCounter() >= self.deadline: raise TimeoutFunctionException()
+        self.armTimer() # Went off early, as timers may
+
+    def call(self, timeout, function, *args):
+        """
+        Returns function(*args), raising TimeoutFunctionException if it runs
+        for timeout seconds or more; None means no limit.  The time the call
+        took is left in lastTime, even if it fails.  With no time left (a
+        timeout of 0 or less) the call times out without running at all.
+        """
+        if timeout != None and timeout <= 0:
+            self.lastTime = 0.0
+            raise TimeoutFunctionException()
+        start = perfCounter()
+        armed = timeout != None and self.usingSignals
+        if timeout != None: self.deadline = start + timeout
+        try:
+            if armed: self.armTimer()
+            result = function(*args)
+        finally:
+            self.deadline = None
+            if armed: signal.setitimer(signal.ITIMER_REAL, 0)
+            self.lastTime = perfCounter() - start
+        if timeout != None and self.lastTime >= timeout:
+            raise TimeoutFunctionException()
+        return result
+
+PROFILED_PHASES = ['observationFunction', 'getAction', 'generateSuccessor', 'display.update', 'rules.process']
+PROFILE_PERCENTILES = [50, 90, 99]
+PROFILE_FORMATS = ['json', 'prometheus']
+
+# Buckets a quarter of an octave wide from 1us to about 2 minutes, so percentiles are within 10%
+PROFILE_BOUNDS = [1e-6 * 2 ** (i / 4.0) for i in range(108)]
+
+class GameProfiler:
+    """
+    Latencies and allocations of the phases of the games it is given to (see
+    Game), for every phase and agent.
+
+    Allocations are the net number of objects tracked by the garbage
+    collector that a call creates, read from gc.get_count.  They are an
+    estimate when a collection runs during the call.
+    """
+
+    def __init__(self):
+        self.latencies = {}  # (phase, agentIndex) -> Histogram
+        self.allocations = {} # (phase, agentIndex) -> count
+
+    def measure(self, phase, agentIndex, function, *args):
+        "Returns function(*args), recording it as a call of phase by agentIndex."
+        allocated = gc.get_count()[0]
+        start = perfCounter()
+        try:
+            return function(*args)
+        finally:
+            elapsed = perfCounter() - start
+            allocated = gc.get_count()[0] - allocated
+            if allocated < 0: allocated += gc.get_threshold()[0]
+            key = (phase, agentIndex)
+            if key not in self.latencies:
+                self.latencies[key] = Histogram(PROFILE_BOUNDS)
+                self.allocations[key] = 0
+            self.latencies[key].add(elapsed)
+            self.allocations[key] += allocated
+
+    def wrap(self, phase, agentIndex, function):
+        "Returns function, measured as phase of agentIndex; None stays None."
+        if function == None: return None
+        return lambda *args: self.measure(phase, agentIndex, function, *args)
+
+    def getSummary(self):
+        """
+        Returns a list with a dictionary for each phase and agent measured,
+        giving the number of calls, their latencies in seconds (total, mean,
+        maximum and PROFILE_PERCENTILES) and allocations.
+        """
+        summary = []
+        for phase, agentIndex in sorted(self.latencies.keys(), key=lambda k: (PROFILED_PHASES.index(k[0]), k[1])):
+            histogram = self.latencies[(phase, agentIndex)]
+            entry = {'phase': phase, 'agent': agentIndex, 'count': histogram.count,
+                     'total': histogram.total, 'mean': histogram.getMean(), 'max': histogram.maximum,
+                     'allocations': self.allocations[(phase, agentIndex)]}
+            for p in PROFILE_PERCENTILES:
+                entry['p%d' % p] = histogram.getPercentile(p)
+            summary.append(entry)
+        return summary
+
+    def toJson(self):
+        return json.dumps({'phases': self.getSummary()}, indent=2, sort_keys=True)
+
+    def toPrometheus(self):
+        "Returns the summary in the Prometheus text exposition format."
+        lines = ['# HELP pacman_phase_seconds Latency of the phases of a game, by agent.',
+                 '# TYPE pacman_phase_seconds summary']
+        summary = self.getSummary()
+        for entry in summary:
+            labels = 'phase="%s",agent="%d"' % (entry['phase'], entry['agent'])
+            for p in PROFILE_PERCENTILES:
+                lines.append('pacman_phase_seconds{%s,quantile="%g"} %.9g' % (labels, p / 100.0, entry['p%d' % p]))
+            lines.append('pacman_phase_seconds_sum{%s} %.9g' % (labels, entry['total']))
+            lines.append('pacman_phase_seconds_count{%s} %d' % (labels, entry['count']))
+        lines += ['# HELP pacman_phase_allocations_total Objects allocated by the phases of a game, by agent.',
+                  '# TYPE pacman_phase_allocations_total counter']
+        for entry in summary:
+            lines.append('pacman_phase_allocations_total{phase="%s",agent="%d"} %d' % (entry['phase'], entry['agent'], entry['allocations']))
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path, format=None):
+        """
+        Writes the summary to path as one of PROFILE_FORMATS; by default JSON
+        for .json files and Prometheus text otherwise.
+        """
+        if format == None:
+            if path.endswith('.json'): format = 'json'
+            else: format = 'prometheus'
+        if format not in PROFILE_FORMATS:
+            raise Exception('Unknown profile format: ' + str(format))
+        if format == 'json': text = self.toJson()
+        else: text = self.toPrometheus()
+        f = open(path, 'w')
+        try: f.write(text)
+        finally: f.close()
@@ -16,6 +16,12 @@ import sys
 import inspect
 import heapq, random
 import cStringIO
+import sampling
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # DenseCounter is unavailable
 
 
 class FixedRandom:
@@ -425,6 +431,207 @@ class Counter(dict):
             addend[key] = -1 * y[key]
         return addend
 
+class DenseCounter:
+    """
+    A counter over a fixed list of keys, holding its values in a NumPy array.
+
+    It reads like a Counter: keys it does not hold count 0 (without being
+    added), and argMax, sortedKeys, totalCount, normalize, divideAll, copy,
+    + - and * (the dot product) work alike.  On top of these it can return
+    its topK keys, multiply elementwise and sample a key, all without
+    looping in Python.  Setting a key that is not in the list is an error.
+
+    >>> a = DenseCounter(['first', 'second', 'third'], [2.0, 6.0, 0.0])
+    >>> a['second'], a['fourth']
+    (6.0, 0)
+    >>> a.normalize()
+    >>> a.argMax()
+    'second'
+    >>> a.asCounter()
+    {'second': 0.75, 'first': 0.25}
+
+    Counters derived from one another share the key list and its index, so
+    keep it unchanged.  DenseCounter.fromCounter converts a Counter.
+    """
+
+    def __init__(self, keys, values=None, index=None):
+        """
+        keys is the list of keys and values their initial counts, 0 by
+        default.  index, the dictionary from each key to its position in
+        keys, can be passed when it already exists.
+        """
+        if numpy == None:
+            raise Exception('DenseCounter requires NumPy')
+        self.keyList = keys
+        if index == None:
+            index = dict([(key, i) for i, key in enumerate(keys)])
+        self.index = index
+        if values is None:
+            self.array = numpy.zeros(len(keys))
+        else:
+            self.array = numpy.array(values, dtype=float)
+            if self.array.shape != (len(keys),):
+                raise Exception('Expected %d values, got %s' % (len(keys), self.array.shape))
+
+    def fromCounter(counter, keys=None):
+        """
+        Returns a DenseCounter with the counts of a Counter, over keys or by
+        default over the sorted keys of the counter.
+        """
+        if keys == None: keys = sorted(counter.keys())
+        dense = DenseCounter(keys)
+        for key, value in counter.items():
+            dense[key] = value
+        return dense
+    fromCounter = staticmethod(fromCounter)
+
+    def asCounter(self):
+        "Returns a Counter of the keys with non-zero counts."
+        counter = Counter()
+        for i in numpy.flatnonzero(self.array).tolist():
+            counter[self.keyList[i]] = self.array.item(i)
+        return counter
+
+    def _withArray(self, array):
+        "Returns a DenseCounter over the same keys holding array."
+        dense = DenseCounter(self.keyList, None, self.index)
+        dense.array = array
+        return dense
+
+    def _alignedArray(self, y):
+        "Returns the counts of the DenseCounter or Counter y over these keys."
+        if isinstance(y, DenseCounter) and y.keyList is self.keyList:
+            return y.array
+        values = numpy.zeros(len(self.keyList))
+        for key, value in y.items():
+            if value == 0: continue
+            if key not in self.index: raise KeyError(key)
+            values[self.index[key]] = value
+        return values
+
+    def __getitem__(self, key):
+        i = self.index.get(key)
+        if i == None: return 0
+        return self.array.item(i)
+
+    def __setitem__(self, key, value):
+        i = self.index.get(key)
+        if i == None: raise KeyError(key)
+        self.array[i] = value
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.keyList)
+
+    def __iter__(self):
+        return iter(self.keyList)
+
+    def get(self, key, default=None):
+        if key in self.index: return self[key]
+        return default
+
+    def keys(self):
+        return list(self.keyList)
+
+    def values(self):
+        return self.array.tolist()
+
+    def items(self):
+        return zip(self.keyList, self.array.tolist())
+
+    def incrementAll(self, keys, count):
+        "Increments all elements of keys by the same count."
+        for key in keys:
+            self[key] += count
+
+    def argMax(self):
+        "Returns the key with the highest value."
+        if len(self.keyList) == 0: return None
+        return self.keyList[int(numpy.argmax(self.array))]
+
+    def sortedKeys(self):
+        "Returns a list of keys sorted by their values, highest first."
+        order = numpy.argsort(-self.array, kind='mergesort')
+        return [self.keyList[i] for i in order.tolist()]
+
+    def topK(self, k):
+        "Returns the k keys with the highest values, highest first."
+        k = min(k, len(self.keyList))
+        if k <= 0: return []
+        if k < len(self.keyList):
+            candidates = numpy.argpartition(-self.array, k - 1)[:k]
+        else:
+            candidates = numpy.arange(k)
+        order = candidates[numpy.argsort(-self.array[candidates], kind='mergesort')]
+        return [self.keyList[i] for i in order.tolist()]
+
+    def totalCount(self):
+        "Returns the sum of counts for all keys."
+        return float(self.array.sum())
+
+    def normalize(self):
+        """
+        Edits the counter such that the total count of all keys sums to 1.
+        A counter of total 0 is left unchanged.
+        """
+        total = self.array.sum()
+        if total == 0: return
+        self.array /= total
+
+    def divideAll(self, divisor):
+        "Divides all counts by divisor"
+        self.array /= float(divisor)
+
+    def copy(self):
+        "Returns a copy of the counter, over the same keys"
+        return self._withArray(self.array.copy())
+
+    def multiply(self, y):
+        """
+        Returns the elementwise product of this counter with another one, a
+        DenseCounter or a Counter, or with a number.
+        """
+        if isinstance(y, (int, long, float)):
+            return self._withArray(self.array * y)
+        return self._withArray(self.array * self._alignedArray(y))
+
+    def sample(self):
+        "Returns a key drawn with probability proportional to its count."
+        return self.nSample(1)[0]
+
+    def nSample(self, n):
+        "Returns a list of n keys drawn with probabilities proportional to their counts."
+        cdf = numpy.cumsum(self.array)
+        if len(cdf) == 0 or cdf[-1] <= 0:
+            raise Exception('Cannot sample from a counter with no positive counts')
+        draws = numpy.array([random.random() for i in range(n)]) * cdf[-1]
+        indices = numpy.minimum(numpy.searchsorted(cdf, draws, side='right'), len(cdf) - 1)
+        return [self.keyList[i] for i in indices.tolist()]
+
+    def __mul__(self, y):
+        "The dot product of the counts of this counter and y, a DenseCounter or a Counter."
+        if isinstance(y, DenseCounter) and y.keyList is self.keyList:
+            return float(numpy.dot(self.array, y.array))
+        total = 0
+        for key, value in y.items():
+            total += self[key] * value
+        return total
+
+    def __add__(self, y):
+        "Returns the sum of this counter and y, over the keys of this counter."
+        return self._withArray(self.array + self._alignedArray(y))
+
+    def __sub__(self, y):
+        "Returns the difference of this counter and y, over the keys of this counter."
+        return self._withArray(self.array - self._alignedArray(y))
+
+    def __str__(self):
+        return str(self.asCounter())
+
+    __repr__ = __str__
+
 def raiseNotDefined():
     fileName = inspect.stack()[1][1]
     line = inspect.stack()[1][2]
@@ -453,38 +660,17 @@ def normalize(vectorOrCounter):
         return [el / s for el in vector]
 
 def nSample(distribution, values, n):
-    if sum(distribution) != 1:
-        distribution = normalize(distribution)
-    rand = [random.random() for i in range(n)]
-    rand.sort()
-    samples = []
-    samplePos, distPos, cdf = 0,0, distribution[0]
-    while samplePos < n:
-        if rand[samplePos] < cdf:
-            samplePos += 1
-            samples.append(values[distPos])
-        else:
-            distPos += 1
-            cdf += distribution[distPos]
-    return samples
+    "Returns n draws from a distribution; see sampling.nSample."
+    return sampling.nSample(distribution, values, n)
 
 def sample(distribution, values = None):
-    if type(distribution) == Counter:
-        items = sorted(distribution.items())
-        distribution = [i[1] for i in items]
-        values = [i[0] for i in items]
-    if sum(distribution) != 1:
-        distribution = normalize(distribution)
-    choice = random.random()
-    i, total= 0, distribution[0]
-    while choice > total:
-        i += 1
-        total += distribution[i]
-    return values[i]
+    "Returns a draw from a distribution, a list of probabilities or a Counter; see sampling.sample."
+    if isinstance(distribution, DenseCounter):
+        return distribution.sample()
+    return sampling.sample(distribution, values)
 
 def sampleFromCounter(ctr):
-    items = sorted(ctr.items())
-    return sample([v for k,v in items], [k for k,v in items])
+    return sampling.sample(ctr)
 
 def getProbability(value, distribution, values):
     """
@@ -504,12 +690,15 @@ def flipCoin( p ):
 def chooseFromDistribution( distribution ):
     "Takes either a counter or a list of (prob, key) pairs and samples"
     if type(distribution) == dict or type(distribution) == Counter:
-        return sample(distribution)
+        return sampling.sample(distribution)
     r = random.random()
+    cdf = []
     base = 0.0
     for prob, element in distribution:
         base += prob
-        if r <= base: return element
+        cdf.append(base)
+    if len(cdf) == 0 or r > base: return None
+    return distribution[sampling.searchCdf(cdf, r)][1]
 
 def nearestPoint( pos ):
     """